@@ -1,23 +1,173 @@
 import streamlit as st
+from streamlit import runtime
+from streamlit.runtime.scriptrunner import get_script_run_ctx
 import sqlite3
 import pandas as pd
 import pdfplumber
 import pytesseract
-from PIL import Image
+from PIL import ImageOps
+import pypdfium2
+import openpyxl
 import re
 import time
 import io
-import random
 import plotly.graph_objects as go
+import streamlit.components.v1 as components
 from datetime import datetime, timedelta
 import base64
+import csv
+import itertools
+import array
+import mimetypes
+import html
 import os
+import sys
+import argparse
+import hashlib
+import json
+import functools
+import collections
+import multiprocessing
+import threading
+import queue
+import atexit
+import logging
+import tempfile
+import shutil
+import uuid
+from contextlib import contextmanager
+import concurrent.futures
+from concurrent.futures import ProcessPoolExecutor
+from concurrent.futures.process import BrokenProcessPool
 
-# ==================== DATABASE SETUP ====================
-def init_db():
-    conn = sqlite3.connect('selectionway.db', check_same_thread=False)
-    c = conn.cursor()
+# ==================== PERFORMANCE TRACING ====================
+# Timing events from every session go into one bounded in-memory log; the sidebar
+# Performance panel summarizes it and exports it as JSON lines.
+TRACE_MAX_EVENTS = 20000
+
+@st.cache_resource
+def get_trace_log():
+    """Process-wide ring buffer of timing events"""
+    return {"events": collections.deque(maxlen=TRACE_MAX_EVENTS), "lock": threading.Lock()}
+
+# Shared worker threads set this to the session they are currently working for
+TRACE_SESSION = threading.local()
+
+def current_session_id():
+    """Id of the session whose script (or attached thread) is running, None elsewhere"""
+    ctx = get_script_run_ctx(suppress_warning=True)
+    return ctx.session_id if ctx else getattr(TRACE_SESSION, "id", None)
+
+def record_trace(stage, ms, **fields):
+    """Append one timing event to the trace log"""
+    event = {"ts": round(time.time(), 3), "stage": stage, "ms": round(ms, 3), "session": current_session_id()}
+    event.update(fields)
+    log = get_trace_log()
+    with log["lock"]:
+        log["events"].append(event)
+
+@contextmanager
+def trace_span(stage, **fields):
+    """Time the enclosed block as one event; the yielded dict adds fields to it
     
+    Recorded in a finally block, so spans cut short by st.rerun() or an error still count.
+    """
+    start = time.perf_counter()
+    try:
+        yield fields
+    finally:
+        record_trace(stage, (time.perf_counter() - start) * 1000, **fields)
+
+def traced(area):
+    """Decorator recording each call as an `area.function_name` span"""
+    def decorator(func):
+        stage = f"{area}.{func.__name__}"
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            with trace_span(stage):
+                return func(*args, **kwargs)
+        return wrapper
+    return decorator
+
+def trace_events(session_id=None):
+    """Snapshot of the trace log, optionally limited to one session"""
+    log = get_trace_log()
+    with log["lock"]:
+        events = list(log["events"])
+    if session_id is not None:
+        events = [event for event in events if event["session"] == session_id]
+    return events
+
+def trace_summary(events):
+    """Calls, total, mean, p95 and max milliseconds per stage, slowest total first"""
+    if not events:
+        return pd.DataFrame(columns=["stage", "calls", "total_ms", "mean_ms", "p95_ms", "max_ms"])
+    ms = pd.DataFrame(events, columns=["stage", "ms"]).groupby("stage")["ms"]
+    summary = pd.DataFrame({"calls": ms.count(), "total_ms": ms.sum(), "mean_ms": ms.mean(),
+                            "p95_ms": ms.quantile(0.95), "max_ms": ms.max()})
+    return summary.sort_values("total_ms", ascending=False).round(1).reset_index()
+
+def trace_jsonl(events):
+    """Events as JSON lines for offline analysis"""
+    return "".join(json.dumps(event) + "\n" for event in events)
+
+# ==================== DATABASE CONNECTIONS ====================
+DB_PATH = os.environ.get("SELECTIONWAY_DB", "selectionway.db")
+DB_POOL_SIZE = 16  # idle connections kept per database file
+SQLITE_PRAGMAS = (
+    "PRAGMA journal_mode=WAL",          # readers don't block the writer and vice versa
+    "PRAGMA synchronous=NORMAL",        # fsync on checkpoint only; safe with WAL
+    "PRAGMA mmap_size=268435456",       # 256 MB memory-mapped reads
+    "PRAGMA temp_store=MEMORY",
+    "PRAGMA busy_timeout=5000"          # wait for writers in other processes instead of failing
+)
+
+def open_connection(db_path):
+    """New connection with the tuned pragmas and a larger prepared-statement cache"""
+    conn = sqlite3.connect(db_path, check_same_thread=False, timeout=5, cached_statements=256)
+    for pragma in SQLITE_PRAGMAS:
+        conn.execute(pragma)
+    return conn
+
+@st.cache_resource
+def get_connection_pool(db_path, pid):
+    """Process-wide pool of idle connections; keyed by pid so forked workers never share a handle"""
+    return {"idle": queue.LifoQueue(maxsize=DB_POOL_SIZE), "write_lock": threading.Lock()}
+
+@contextmanager
+def db_connection(db_path=DB_PATH):
+    """Borrow a pooled connection; the calling thread owns it until the block exits"""
+    pool = get_connection_pool(db_path, os.getpid())
+    try:
+        conn = pool["idle"].get_nowait()
+    except queue.Empty:
+        conn = open_connection(db_path)
+    try:
+        yield conn
+    finally:
+        if conn.in_transaction:
+            conn.rollback()
+        try:
+            pool["idle"].put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+@contextmanager
+def db_write(db_path=DB_PATH):
+    """Run the block as one IMMEDIATE transaction, one writer per process at a time"""
+    pool = get_connection_pool(db_path, os.getpid())
+    with pool["write_lock"], db_connection(db_path) as conn:
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            yield conn
+        except BaseException:
+            conn.rollback()
+            raise
+        conn.commit()
+
+# ==================== DATABASE SETUP ====================
+def init_db(c):
+    """Migration 1: core tables"""
     # Users table
     c.execute('''CREATE TABLE IF NOT EXISTS users
                  (id INTEGER PRIMARY KEY, name TEXT, email TEXT, phone TEXT)''')
@@ -37,14 +187,9 @@ def init_db():
     # Quiz results table
     c.execute('''CREATE TABLE IF NOT EXISTS quiz_results
                  (id INTEGER PRIMARY KEY, user_id INTEGER, score INTEGER, total_questions INTEGER, time_taken INTEGER, quiz_date TEXT)''')
-    
-    conn.commit()
-    conn.close()
 
-def add_sample_data():
-    conn = sqlite3.connect('selectionway.db', check_same_thread=False)
-    c = conn.cursor()
-    
+def add_sample_data(c):
+    """Migration 2: demo user, courses and materials"""
     # Add sample user
     c.execute("INSERT OR IGNORE INTO users VALUES (1, 'Deepak', 'deepak@example.com', '6388974650')")
     
@@ -73,164 +218,1756 @@ def add_sample_data():
         (5, 3, 'Quantitative Aptitude.pdf', 'PDF', '2024-09-20')
     ]
     c.executemany("INSERT OR IGNORE INTO study_materials VALUES (?, ?, ?, ?, ?)", materials)
+
+def add_enrollment_keys(c):
+    """Migration 3: unique enrollments and indexes for the per-user and per-course lookups"""
+    # Reruns of the old seeding duplicated rows; keep the earliest of each pair before enforcing uniqueness
+    c.execute('''DELETE FROM enrollments WHERE rowid NOT IN
+                 (SELECT MIN(rowid) FROM enrollments GROUP BY user_id, course_id)''')
+    c.execute("CREATE UNIQUE INDEX IF NOT EXISTS idx_enrollments_user_course ON enrollments(user_id, course_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_study_materials_course ON study_materials(course_id)")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quiz_results_user_date ON quiz_results(user_id, quiz_date)")
+
+def add_quiz_answers(c):
+    """Migration 4: per-question answers of each stored quiz attempt"""
+    c.execute('''CREATE TABLE IF NOT EXISTS quiz_answers
+                 (result_id INTEGER, question_index INTEGER, selected TEXT, correct_answer TEXT,
+                  is_correct INTEGER, time_spent REAL, attempts INTEGER)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_quiz_answers_result ON quiz_answers(result_id)")
+
+def add_progress_rollups(c):
+    """Migration 5: course link on attempts plus per user / course / day rollup tables"""
+    c.execute("ALTER TABLE quiz_results ADD COLUMN course_id INTEGER")
+    c.execute('''CREATE TABLE IF NOT EXISTS user_quiz_stats
+                 (user_id INTEGER PRIMARY KEY, quizzes_taken INTEGER, total_score INTEGER, total_questions INTEGER,
+                  best_percent REAL, total_seconds INTEGER, current_streak INTEGER, active_days INTEGER,
+                  last_quiz_day TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS user_course_stats
+                 (user_id INTEGER, course_id INTEGER, quizzes_taken INTEGER, total_score INTEGER,
+                  total_questions INTEGER, total_seconds INTEGER, PRIMARY KEY (user_id, course_id))''')
+    c.execute('''CREATE TABLE IF NOT EXISTS user_daily_stats
+                 (user_id INTEGER, day TEXT, quizzes_taken INTEGER, total_score INTEGER,
+                  total_questions INTEGER, total_seconds INTEGER, PRIMARY KEY (user_id, day))''')
+    rebuild_progress_rollups(c)
+
+def add_question_bank(c):
+    """Migration 6: deduplicated question bank with source papers and a full-text index"""
+    c.execute('''CREATE TABLE IF NOT EXISTS question_bank
+                 (id INTEGER PRIMARY KEY, text_hash TEXT UNIQUE, question TEXT, options TEXT,
+                  correct_answer TEXT, added_at TEXT)''')
+    c.execute('''CREATE TABLE IF NOT EXISTS question_sources
+                 (pdf_sha256 TEXT, question_number INTEGER, question_id INTEGER,
+                  PRIMARY KEY (pdf_sha256, question_number))''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_question_sources_question ON question_sources(question_id)")
+    # External-content FTS5 index: the text lives once in question_bank, the trigger keeps the index in step
+    c.execute('''CREATE VIRTUAL TABLE IF NOT EXISTS question_bank_fts
+                 USING fts5(question, options, content='question_bank', content_rowid='id')''')
+    c.execute('''CREATE TRIGGER IF NOT EXISTS question_bank_fts_insert AFTER INSERT ON question_bank BEGIN
+                     INSERT INTO question_bank_fts(rowid, question, options) VALUES (new.id, new.question, new.options);
+                 END''')
+
+def add_material_blobs(c):
+    """Migration 7: content hash, size and MIME type linking each study material to its stored file"""
+    c.execute("ALTER TABLE study_materials ADD COLUMN sha256 TEXT")
+    c.execute("ALTER TABLE study_materials ADD COLUMN size_bytes INTEGER")
+    c.execute("ALTER TABLE study_materials ADD COLUMN mime_type TEXT")
+    c.execute("CREATE INDEX IF NOT EXISTS idx_study_materials_sha256 ON study_materials(sha256)")
+
+def add_user_email_index(c):
+    """Migration 8: email lookups for bulk student import"""
+    c.execute("CREATE INDEX IF NOT EXISTS idx_users_email ON users(email)")
+
+def add_converted_papers(c):
+    """Migration 9: papers already run through the batch converter, by content hash"""
+    c.execute('''CREATE TABLE IF NOT EXISTS converted_papers
+                 (pdf_sha256 TEXT PRIMARY KEY, path TEXT, pages INTEGER, questions INTEGER,
+                  page_errors INTEGER, converted_at TEXT)''')
+
+# Numbered migrations, applied once per database in order; append new ones, never edit old ones
+MIGRATIONS = [
+    (1, "core tables", init_db),
+    (2, "sample data", add_sample_data),
+    (3, "enrollment keys and indexes", add_enrollment_keys),
+    (4, "quiz answers", add_quiz_answers),
+    (5, "progress rollups", add_progress_rollups),
+    (6, "question bank", add_question_bank),
+    (7, "study material blobs", add_material_blobs),
+    (8, "user email index", add_user_email_index),
+    (9, "converted papers", add_converted_papers)
+]
+
+def migrate_db(db_path, migrations):
+    """Apply pending migrations and record them in schema_version; returns the versions applied"""
+    with db_connection(db_path) as conn:
+        conn.execute('''CREATE TABLE IF NOT EXISTS schema_version
+                        (version INTEGER PRIMARY KEY, name TEXT, applied_at TEXT)''')
+        current = conn.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+    if all(version <= current for version, _, _ in migrations):
+        return []
     
-    conn.commit()
-    conn.close()
+    applied = []
+    with db_write(db_path) as conn:
+        c = conn.cursor()
+        # Re-read inside the write transaction: another process may have migrated meanwhile
+        current = c.execute("SELECT COALESCE(MAX(version), 0) FROM schema_version").fetchone()[0]
+        for version, name, migration in migrations:
+            if version > current:
+                migration(c)
+                c.execute("INSERT INTO schema_version VALUES (?, ?, ?)",
+                          (version, name, datetime.now().strftime("%Y-%m-%d %H:%M:%S")))
+                applied.append(version)
+    return applied
+
+@st.cache_resource
+def ensure_db_schema(db_path, _migrations):
+    """Migrate a database once per process; later reruns hit this cache and touch nothing"""
+    return migrate_db(db_path, _migrations)
+
+# ==================== PDF TEXT CACHE ====================
+PDF_CACHE_DB = 'pdf_cache.db'
+PDF_CACHE_MAX_BYTES = 200 * 1024 * 1024  # LRU entries are evicted above this total
+SPOOL_CHUNK_BYTES = 1024 * 1024
+EXTRACTOR_VERSION = "pdfplumber+tesseract/1"
+OCR_SETTINGS = {
+    "lang": "eng",
+    "config": "",
+    "dpi": 150,                  # render resolution handed to Tesseract
+    "grayscale": True,           # render straight to 8-bit instead of RGB
+    "binarize_threshold": 160,   # 0 disables binarization
+    "crop_to_text": True         # drop blank margins before OCR
+}
 
-init_db()
-add_sample_data()
+def init_pdf_cache(c):
+    """Migration 1: page text cache"""
+    # Extracted page text keyed by upload hash + extractor/OCR settings
+    c.execute('''CREATE TABLE IF NOT EXISTS pdf_text_cache
+                 (cache_key TEXT PRIMARY KEY, pdf_sha256 TEXT, pages TEXT, size_bytes INTEGER,
+                  created_at TEXT, last_access REAL)''')
+    c.execute("CREATE INDEX IF NOT EXISTS idx_pdf_text_cache_access ON pdf_text_cache(last_access)")
+
+PDF_CACHE_MIGRATIONS = [
+    (1, "page text cache", init_pdf_cache)
+]
+
+@st.cache_resource
+def get_pdf_cache_stats():
+    """Process-wide hit/miss counters for the PDF text cache"""
+    return {"hits": 0, "misses": 0}
+
+def spool_pdf(pdf_file):
+    """Copy an upload, file object or bytes to a temp file in chunks; the caller removes it"""
+    fd, path = tempfile.mkstemp(prefix="selectionway-", suffix=".pdf")
+    with os.fdopen(fd, "wb") as f:
+        if isinstance(pdf_file, bytes):
+            f.write(pdf_file)
+        else:
+            pdf_file.seek(0)
+            shutil.copyfileobj(pdf_file, f, SPOOL_CHUNK_BYTES)
+    return path
+
+@contextmanager
+def spooled_pdf(pdf_file):
+    """Path of the PDF on disk, spooling it to a temp file for the duration if it isn't a path already"""
+    if isinstance(pdf_file, (str, os.PathLike)):
+        yield os.fspath(pdf_file)
+        return
+    path = spool_pdf(pdf_file)
+    try:
+        yield path
+    finally:
+        os.remove(path)
+
+def update_digest(digest, pdf_source):
+    """Feed a PDF's bytes (or a PDF file, in chunks) to a hashlib digest"""
+    if isinstance(pdf_source, bytes):
+        digest.update(pdf_source)
+        return digest
+    with open(pdf_source, "rb") as f:
+        while chunk := f.read(SPOOL_CHUNK_BYTES):
+            digest.update(chunk)
+    return digest
+
+def pdf_sha256(pdf_source):
+    """SHA-256 of a PDF given as bytes or a path"""
+    return update_digest(hashlib.sha256(), pdf_source).hexdigest()
+
+def pdf_cache_key(pdf_source, ocr_settings=None):
+    """SHA-256 of the upload combined with the extractor and OCR settings"""
+    settings = {"extractor": EXTRACTOR_VERSION, "ocr": ocr_settings or OCR_SETTINGS}
+    digest = update_digest(hashlib.sha256(), pdf_source)
+    digest.update(json.dumps(settings, sort_keys=True).encode())
+    return digest.hexdigest()
+
+@traced("db")
+def load_cached_pages(cache_key):
+    """Return cached page texts for a key, or None on a miss"""
+    stats = get_pdf_cache_stats()
+    with db_connection(PDF_CACHE_DB) as conn:
+        row = conn.execute("SELECT pages FROM pdf_text_cache WHERE cache_key = ?", (cache_key,)).fetchone()
+    if row:
+        with db_write(PDF_CACHE_DB) as conn:
+            conn.execute("UPDATE pdf_text_cache SET last_access = ? WHERE cache_key = ?", (time.time(), cache_key))
+        stats["hits"] += 1
+    else:
+        stats["misses"] += 1
+    return json.loads(row[0]) if row else None
+
+@traced("db")
+def store_cached_pages(cache_key, pdf_sha256, pages, max_bytes=PDF_CACHE_MAX_BYTES):
+    """Save page texts and evict least recently used entries over the size cap"""
+    payload = json.dumps(pages)
+    with db_write(PDF_CACHE_DB) as conn:
+        c = conn.cursor()
+        c.execute("INSERT OR REPLACE INTO pdf_text_cache VALUES (?, ?, ?, ?, ?, ?)",
+                  (cache_key, pdf_sha256, payload, len(payload.encode()),
+                   datetime.now().strftime("%Y-%m-%d %H:%M:%S"), time.time()))
+        c.execute('''DELETE FROM pdf_text_cache WHERE cache_key IN (
+                         SELECT cache_key FROM (
+                             SELECT cache_key, SUM(size_bytes) OVER (ORDER BY last_access DESC) AS running
+                             FROM pdf_text_cache)
+                         WHERE running > ?)''', (max_bytes,))
+
+def pdf_cache_summary():
+    """Entry count, stored bytes and hit/miss counters for display"""
+    with db_connection(PDF_CACHE_DB) as conn:
+        entries, size = conn.execute("SELECT COUNT(*), COALESCE(SUM(size_bytes), 0) FROM pdf_text_cache").fetchone()
+    return {"entries": entries, "size_bytes": size, **get_pdf_cache_stats()}
+
+# ==================== OCR ENGINE ====================
+@functools.lru_cache(maxsize=None)
+def tesseract_config(config, dpi, binarized):
+    """Tesseract command-line options for a set of OCR settings, built once per distinct setting"""
+    options = [f"--dpi {dpi}"]
+    if binarized:
+        # Pages are already dark text on white, so skip Tesseract's inverted-text pass
+        options.append("-c tessedit_do_invert=0")
+    if config:
+        options.append(config)
+    return " ".join(options)
+
+def render_page_image(pdfium_doc, page_index, settings=None):
+    """Render a page straight to a PIL image at the OCR resolution"""
+    settings = settings or OCR_SETTINGS
+    page = pdfium_doc[page_index]
+    try:
+        return page.render(scale=settings["dpi"] / 72, grayscale=settings["grayscale"]).to_pil()
+    finally:
+        page.close()
+
+def preprocess_page_image(image, settings=None):
+    """Grayscale, binarize and crop a rendered page to its text bounding box; None if blank"""
+    settings = settings or OCR_SETTINGS
+    if image.mode != "L":
+        image = image.convert("L")
+    threshold = settings["binarize_threshold"]
+    if threshold:
+        image = image.point([0] * threshold + [255] * (256 - threshold))
+    if settings["crop_to_text"]:
+        bbox = ImageOps.invert(image).getbbox()
+        if bbox is None:
+            return None
+        margin = settings["dpi"] // 10
+        left, top, right, bottom = bbox
+        image = image.crop((max(0, left - margin), max(0, top - margin),
+                            min(image.width, right + margin), min(image.height, bottom + margin)))
+    return image
+
+def ocr_pdf_page(pdfium_doc, page_index, settings=None):
+    """OCR an image-only page without the PNG encode/decode round-trip"""
+    settings = settings or OCR_SETTINGS
+    image = preprocess_page_image(render_page_image(pdfium_doc, page_index, settings), settings)
+    if image is None:
+        return ""
+    # pytesseract hands Tesseract a temp file in the image's format; raw PGM skips PNG compression
+    image.format = "PPM"
+    config = tesseract_config(settings["config"], settings["dpi"], bool(settings["binarize_threshold"]))
+    return pytesseract.image_to_string(image, lang=settings["lang"], config=config)
 
 # ==================== PDF QUIZ FUNCTIONS ====================
-def extract_text_from_pdf(pdf_file):
-    """Extract text from PDF with OCR support"""
-    text = ""
+PDF_WORKERS = int(os.environ.get("PDF_WORKERS", os.cpu_count() or 1))
+PARALLEL_MIN_PAGES = 8  # below this the pool start-up costs more than it saves
+
+def fork_process_pool(max_workers):
+    """Process pool with forked workers: Streamlit's script module can't be re-imported by spawn"""
+    ctx = multiprocessing.get_context("fork") if "fork" in multiprocessing.get_all_start_methods() else None
+    return ProcessPoolExecutor(max_workers=max_workers, mp_context=ctx)
+
+def open_plumber(pdf_source):
+    """pdfplumber document from a path (read lazily from disk) or bytes"""
+    return pdfplumber.open(pdf_source if isinstance(pdf_source, str) else io.BytesIO(pdf_source))
+
+def iter_extract_pages(pdf_source, start, stop, ocr_settings=None):
+    """Extract pages [start, stop) as (text, error, timing) triples, one page in memory at a time"""
+    pdfium_doc = None  # opened once per range, only if a page needs OCR
     try:
-        with pdfplumber.open(pdf_file) as pdf:
-            for page in pdf.pages:
-                page_text = page.extract_text()
-                if page_text and page_text.strip():
-                    text += page_text + "\n"
-                else:
-                    try:
-                        image = page.to_image()
-                        img_bytes = io.BytesIO()
-                        image.save(img_bytes, format='PNG')
-                        img_bytes.seek(0)
-                        ocr_text = pytesseract.image_to_string(Image.open(img_bytes))
-                        text += ocr_text + "\n"
-                    except:
-                        continue
-    except Exception as e:
-        st.error(f"Error processing PDF: {str(e)}")
-    return text
+        with open_plumber(pdf_source) as pdf:
+            for page_index in range(start, stop):
+                # Workers can't reach the parent's trace log; timings travel back with the text
+                timing = {"ocr": False}
+                page_start = time.perf_counter()
+                page = None
+                try:
+                    page = pdf.pages[page_index]
+                    page_text = page.extract_text()
+                    if not (page_text and page_text.strip()):
+                        if pdfium_doc is None:
+                            pdfium_doc = pypdfium2.PdfDocument(pdf_source)
+                        timing["ocr"] = True
+                        ocr_start = time.perf_counter()
+                        page_text = ocr_pdf_page(pdfium_doc, page_index, ocr_settings)
+                        timing["ocr_ms"] = round((time.perf_counter() - ocr_start) * 1000, 3)
+                    result = (page_text, None)
+                except Exception as e:
+                    result = (None, f"{type(e).__name__}: {e}")
+                finally:
+                    # Parsed layout objects are cached on the page (MBs each) until released
+                    if page is not None:
+                        page.close()
+                timing["ms"] = (time.perf_counter() - page_start) * 1000
+                yield (*result, timing)
+    finally:
+        if pdfium_doc is not None:
+            pdfium_doc.close()
 
-def fast_parse_pdf_content(text):
-    """Ultra-fast PDF parsing with optimized regex"""
-    questions = []
-    raw_questions = re.split(r'(?i)(?:Q|Question\s*)\d+[\.\)\s:-]+', text)
+def extract_page_range(pdf_source, start, stop, ocr_settings=None):
+    """Extract pages [start, stop) as a list of (text, error, timing) triples; runs inside pool workers"""
+    return list(iter_extract_pages(pdf_source, start, stop, ocr_settings))
+
+def pdf_page_count(pdf_source):
+    """Number of pages, read from the page tree without parsing any content"""
+    doc = pypdfium2.PdfDocument(pdf_source)
+    try:
+        return len(doc)
+    finally:
+        doc.close()
+
+def iter_page_results(pdf_source, workers=None, pool=None):
+    """Yield (text, error) per page in document order, splitting page ranges across worker processes
     
-    for i, block in enumerate(raw_questions[1:21], 1):  # Limit to 20 questions for speed
-        if not block.strip():
-            continue
-        try:
-            question_text = re.split(r'(?i)A\)|Answer:', block)[0].strip()[:300]
-            
-            options = {}
-            for match in re.finditer(r'([A-D])\)\s*([^\n]+)', block):
-                options[match.group(1)] = match.group(2).strip()
-            
-            answer_match = re.search(r'(?i)Answer:\s*([A-D])', block)
-            correct_answer = answer_match.group(1) if answer_match else 'A'
-            
-            questions.append({
-                "id": i,
-                "question": question_text,
-                "options": options or {'A': 'Option A', 'B': 'Option B', 'C': 'Option C', 'D': 'Option D'},
-                "correct_answer": correct_answer,
-                "difficulty": random.choice(["Easy", "Medium", "Hard"]),
-                "time_spent": 0,
-                "attempts": 0
-            })
-        except:
-            continue
+    `pdf_source` is bytes or a path; with a path, workers read the file themselves instead of
+    receiving a copy of the PDF. Pass a shared `pool` to bound extraction processes across
+    callers; otherwise one is created for this PDF and shut down afterwards.
+    """
+    for page_no, (text, error, timing) in enumerate(iter_page_ranges(pdf_source, workers, pool), 1):
+        record_trace("pdf.page", timing.pop("ms"), page=page_no, error=bool(error), **timing)
+        yield text, error
+
+def iter_page_ranges(pdf_source, workers, pool=None):
+    """(text, error, timing) per page in document order from serial or pooled range extraction"""
+    workers = workers or PDF_WORKERS
+    page_count = pdf_page_count(pdf_source)
     
-    return questions
+    if workers <= 1 or page_count < PARALLEL_MIN_PAGES:
+        # One open document for the whole run; pages are released as they are read
+        yield from iter_extract_pages(pdf_source, 0, page_count)
+        return
+    
+    # Several small ranges per worker so OCR-heavy stretches don't leave others idle
+    chunk = max(1, page_count // (workers * 4))
+    ranges = [(start, min(start + chunk, page_count)) for start in range(0, page_count, chunk)]
+    own_pool = pool is None
+    if own_pool:
+        pool = fork_process_pool(min(workers, len(ranges)))
+    futures = [pool.submit(extract_page_range, pdf_source, start, stop) for start, stop in ranges]
+    try:
+        for (start, stop), future in zip(ranges, futures):
+            try:
+                yield from future.result()
+            except Exception as e:
+                if isinstance(e, BrokenProcessPool) and not own_pool:
+                    raise  # a shared pool is replaced by its owner, not reported page by page
+                yield from ((None, f"{type(e).__name__}: {e}", {"ms": 0.0, "ocr": False}) for _ in range(start, stop))
+    finally:
+        # Closed early (e.g. a cancelled job): drop this PDF's ranges that haven't started
+        for future in futures:
+            future.cancel()
+        if own_pool:
+            pool.shutdown(cancel_futures=True)
 
-def generate_ai_explanation(question, correct_answer, options):
-    """Generate AI explanation for questions"""
-    explanations = {
-        "grammar": "This question tests grammatical rules.",
-        "vocabulary": "This vocabulary question requires word understanding.",
-        "comprehension": "This tests reading comprehension skills.",
-        "logic": "This requires analytical thinking.",
-        "general": "This evaluates fundamental knowledge."
-    }
+@traced("pdf")
+def extract_pages_from_pdf(pdf_source, workers=None):
+    """Extract text per page in document order
     
-    question_lower = question.lower()
-    if any(word in question_lower for word in ['synonym', 'antonym', 'word', 'meaning']):
-        exp_type = "vocabulary"
-    elif any(word in question_lower for word in ['tense', 'grammar', 'sentence', 'verb']):
-        exp_type = "grammar"
-    elif any(word in question_lower for word in ['passage', 'read', 'comprehension']):
-        exp_type = "comprehension"
-    elif any(word in question_lower for word in ['logic', 'reason', 'deduce', 'infer']):
-        exp_type = "logic"
-    else:
-        exp_type = "general"
+    Returns (pages, errors): failed pages are None in `pages` and listed in `errors`
+    as (page_number, message) instead of being dropped silently.
+    """
+    results = list(iter_page_results(pdf_source, workers))
+    pages = [text for text, _ in results]
+    errors = [(page_no, error) for page_no, (_, error) in enumerate(results, 1) if error]
+    return pages, errors
+
+def iter_pdf_pages(pdf_file, workers=None, errors=None, pool=None):
+    """Yield page texts in document order as they are extracted, served from the text cache when possible
     
-    return f"""
-**AI Analysis:** This is a {exp_type} question.
+    Failed pages are skipped and appended to `errors` as (page_number, message).
+    """
+    errors = [] if errors is None else errors
+    with spooled_pdf(pdf_file) as pdf_path:
+        cache_key = pdf_cache_key(pdf_path)
+        pages = load_cached_pages(cache_key)
+        if pages is not None:
+            yield from (page_text for page_text in pages if page_text is not None)
+            return
+        
+        pages = []
+        for page_no, (page_text, error) in enumerate(iter_page_results(pdf_path, workers, pool), 1):
+            pages.append(page_text)
+            if error:
+                errors.append((page_no, error))
+            else:
+                yield page_text
+        # Don't persist partial results; a failed page should be retried next time
+        if None not in pages:
+            store_cached_pages(cache_key, pdf_sha256(pdf_path), pages)
+
+def write_text_from_pdf(pdf_file, out, workers=None, errors=None):
+    """Write each page's text to `out` as soon as it is extracted; returns the number of pages written"""
+    written = 0
+    for page_text in iter_pdf_pages(pdf_file, workers, errors):
+        out.write(page_text + "\n")
+        written += 1
+    return written
+
+@traced("pdf")
+def extract_text_from_pdf(pdf_file, workers=None):
+    """Extract text from PDF with OCR support, reusing cached results for repeat uploads"""
+    text = io.StringIO()
+    errors = []
+    try:
+        write_text_from_pdf(pdf_file, text, workers, errors)
+    except Exception as e:
+        st.error(f"Error processing PDF: {str(e)}")
+    for page_no, error in errors:
+        st.warning(f"⚠️ Page {page_no} skipped: {error}")
+    return text.getvalue()
+
+# One line-anchored pattern classifies every line in a single left-to-right pass
+QUESTION_TOKEN = re.compile(r"""
+    ^[ \t]*(?:
+        (?:Q|Question)[ \t]*\.?[ \t]*\d+(?:[ \t]*[.):\-][ \t]*|[ \t]+)(?P<question>.*)     # Q1. / Question 12: / Q.3)
+      | \(?(?P<letter>[A-E])[.)][ \t]+(?P<option>.*)                                    # A) / (a) / a.
+      | (?:Ans(?:wer)?|Correct[ \t]+Answer)[ \t]*[:.\-][ \t]*\(?(?P<answer>[A-E])\b.*   # Answer: B / Ans. (b)
+      | (?P<text>.*)                                                                    # continuation line
+    )$""", re.IGNORECASE | re.MULTILINE | re.VERBOSE)
+
+# "(b) 14" / "b) 14" after the current option on the same line; "b." is too ambiguous inline
+INLINE_OPTION = {letter: re.compile(rf'\s\(?[{letter}{letter.lower()}]\)\s') for letter in "BCDE"}
+
+def tokenize_questions(text):
+    """Yield ('question' | 'option' | 'answer' | 'text', letter, value) tokens for each line"""
+    for match in QUESTION_TOKEN.finditer(text):
+        if match.group('question') is not None:
+            yield 'question', None, match.group('question').strip()
+        elif match.group('letter'):
+            letter, option_text = match.group('letter').upper(), match.group('option')
+            # Options printed side by side: "(a) 12 (b) 14 (c) 16 (d) 18"
+            while letter < 'E' and (inline := INLINE_OPTION[chr(ord(letter) + 1)].search(option_text)):
+                yield 'option', letter, option_text[:inline.start()].strip()
+                letter, option_text = chr(ord(letter) + 1), option_text[inline.end():]
+            yield 'option', letter, option_text.strip()
+        elif match.group('answer'):
+            yield 'answer', match.group('answer').upper(), None
+        elif match.group('text').strip():
+            yield 'text', None, match.group('text').strip()
+
+def make_question(question_id, question_text, options, correct_answer):
+    """Question dict as parsed from a paper; answers and timings live in the quiz session"""
+    return {
+        "id": question_id,
+        "question": question_text,
+        "options": options or {'A': 'Option A', 'B': 'Option B', 'C': 'Option C', 'D': 'Option D'},
+        "correct_answer": correct_answer or 'A'
+    }
+
+# Checked in this order: the first category with any keyword in the question wins
+QUESTION_CATEGORIES = {
+    "vocabulary": ['synonym', 'antonym', 'word', 'meaning'],
+    "grammar": ['tense', 'grammar', 'sentence', 'verb'],
+    "comprehension": ['passage', 'read', 'comprehension'],
+    "logic": ['logic', 'reason', 'deduce', 'infer'],
+}
+CATEGORY_KEYWORDS = {word: category for category, words in QUESTION_CATEGORIES.items() for word in words}
+CATEGORY_MATCHER = re.compile("|".join(map(re.escape, sorted(CATEGORY_KEYWORDS, key=len, reverse=True))))
+CATEGORY_RANK = {category: rank for rank, category in enumerate(QUESTION_CATEGORIES)}
 
-**Why {correct_answer} is correct:**
-- It follows the rules of {exp_type}
+EXPLANATIONS = {
+    category: f"""
+**AI Analysis:** This is a {category} question.
+
+**Why {{correct_answer}} is correct:**
+- It follows the rules of {category}
 - Other options contain common mistakes
 
-**Tip:** Practice more {exp_type} questions.
+**Tip:** Practice more {category} questions.
 """
+    for category in [*QUESTION_CATEGORIES, "general"]
+}
+
+def question_category(question_text):
+    """Category of a question from one pass of the combined keyword matcher"""
+    found = {CATEGORY_KEYWORDS[word] for word in CATEGORY_MATCHER.findall(question_text.lower())}
+    return min(found, key=CATEGORY_RANK.get) if found else "general"
+
+def difficulty_score(question_text, options):
+    """0-1 score from question length and how many words the options share; same input, same score"""
+    length = min(len(question_text.split()) / 40, 1.0)
+    
+    # 0 when no word repeats across options, 1 when every option has the same words
+    option_words = [set(text.lower().split()) for text in options.values()]
+    total = sum(map(len, option_words))
+    similarity = 0.0
+    if len(option_words) > 1 and total:
+        shared = total - len(set().union(*option_words))
+        similarity = shared * len(option_words) / (total * (len(option_words) - 1))
+    
+    return round(0.5 * length + 0.5 * similarity, 3)
+
+def classify_questions(questions):
+    """Tag each question with category and difficulty as it passes through the parse pipeline"""
+    for question in questions:
+        score = difficulty_score(question['question'], question['options'])
+        question['category'] = question_category(question['question'])
+        question['difficulty_score'] = score
+        question['difficulty'] = "Easy" if score < 0.25 else "Medium" if score < 0.5 else "Hard"
+        yield question
+
+def assemble_questions(tokens):
+    """Build question dicts from a token stream, yielding each as soon as the next question starts"""
+    question_id = 0
+    question_lines = None  # None until the first question header is seen
+    options, option_letter, correct_answer = {}, None, None
+    
+    for kind, letter, value in tokens:
+        if kind == 'question':
+            if question_lines is not None:
+                yield make_question(question_id, " ".join(question_lines), options, correct_answer)
+            question_id += 1
+            question_lines = [value] if value else []
+            options, option_letter, correct_answer = {}, None, None
+        elif question_lines is None:
+            continue  # preamble before the first question
+        elif kind == 'option' and correct_answer is None:
+            options[letter] = value
+            option_letter = letter
+        elif kind == 'answer' and correct_answer is None:
+            correct_answer = letter
+        elif kind == 'text' and correct_answer is None:
+            # Wrapped lines belong to the last option, or to the question before any option
+            if option_letter:
+                options[option_letter] = f"{options[option_letter]} {value}".strip()
+            else:
+                question_lines.append(value)
+    
+    if question_lines is not None:
+        yield make_question(question_id, " ".join(question_lines), options, correct_answer)
+
+def iter_questions_from_pages(page_texts):
+    """Yield questions while pages are still arriving; a question may continue onto the next page"""
+    return classify_questions(assemble_questions(
+        token for page_text in page_texts for token in tokenize_questions(page_text)))
+
+@traced("parse")
+def fast_parse_pdf_content(text):
+    """Single-pass question parser: one precompiled tokenizer over the whole text, no question cap"""
+    return list(classify_questions(assemble_questions(tokenize_questions(text))))
+
+def stream_quiz_from_pdf(pdf_source, quiz_data, workers=None, pool=None, cancel=None):
+    """Add questions to a quiz session page by page; runs on a background thread while the quiz is played
+    
+    Setting the `cancel` event stops reading after the current page; questions so far are kept.
+    """
+    def counted_pages():
+        pages = iter_pdf_pages(pdf_source, workers, quiz_data['page_errors'], pool)
+        try:
+            for page_text in pages:
+                quiz_data['pages_done'] += 1
+                yield page_text
+                if cancel is not None and cancel.is_set():
+                    break
+        finally:
+            pages.close()
+    
+    try:
+        quiz_data['pages_total'] = pdf_page_count(pdf_source)
+        paper_sha256 = pdf_sha256(pdf_source)
+        with trace_span("quiz.stream_quiz_from_pdf") as span:
+            batch, saved_pages = [], 0
+            for question in iter_questions_from_pages(counted_pages()):
+                batch.append(question)
+                # One bank write per page read; the first question is released straight away
+                if quiz_data['pages_done'] > saved_pages:
+                    saved_pages = quiz_data['pages_done']
+                    add_bank_questions(quiz_data, paper_sha256, batch)
+                    batch = []
+            add_bank_questions(quiz_data, paper_sha256, batch)
+            span.update(pages=quiz_data['pages_done'], questions=quiz_length(quiz_data))
+        if quiz_length(quiz_data):
+            invalidate_queries("question_bank")
+    except BrokenProcessPool:
+        quiz_data['load_error'] = "a PDF worker process crashed"
+        raise  # the caller owns the pool and has to replace it
+    except Exception as e:
+        quiz_data['load_error'] = str(e)
+    finally:
+        quiz_data['loading'] = False
+
+def generate_ai_explanation(question):
+    """Explanation for a classified question"""
+    return EXPLANATIONS[question['category']].format(correct_answer=question['correct_answer'])
+
+# Bundled with the quiz player component so playback never leaves the machine
+SOUNDS_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "quiz_player", "sounds")
+FEEDBACK_SOUNDS = {
+    "correct": "correct.wav",
+    "wrong": "wrong.wav"
+}
+
+@st.cache_resource
+def feedback_sound_uris():
+    """Feedback sounds as data URIs, read from disk once per process"""
+    uris = {}
+    for kind, filename in FEEDBACK_SOUNDS.items():
+        with open(os.path.join(SOUNDS_DIR, filename), "rb") as f:
+            uris[kind] = "data:audio/wav;base64," + base64.b64encode(f.read()).decode()
+    return uris
 
 def autoplay_audio(sound_type):
-    """Play sound based on answer correctness"""
-    if not st.session_state.get('sound_enabled', True):
+    """Queue the feedback sound; it plays on the rerun that follows the answer click"""
+    if st.session_state.get('sound_enabled', True):
+        st.session_state.pending_sound = 'correct' if sound_type == 'correct' else 'wrong'
+
+def play_pending_sound():
+    """Play the sound queued by autoplay_audio, if any"""
+    sound_type = st.session_state.pop('pending_sound', None)
+    if sound_type is None:
         return
-        
-    if sound_type == "correct":
-        sound_file = """
-        <audio autoplay>
-        <source src="https://assets.mixkit.co/sfx/preview/mixkit-correct-answer-tone-2870.mp3" type="audio/mpeg">
-        </audio>
-        """
-    else:
-        sound_file = """
-        <audio autoplay>
-        <source src="https://assets.mixkit.co/sfx/preview/mixkit-wrong-answer-fail-notification-946.mp3" type="audio/mpeg">
-        </audio>
-        """
+    
+    sound_file = f"""
+    <audio autoplay>
+    <source src="{feedback_sound_uris()[sound_type]}" type="audio/wav">
+    </audio>
+    """
     st.markdown(sound_file, unsafe_allow_html=True)
 
+# Browser-side quiz runner: navigation, answers, marks and the timer never rerun the script
+quiz_player = components.declare_component(
+    "quiz_player", path=os.path.join(os.path.dirname(os.path.abspath(__file__)), "components", "quiz_player"))
+CLIENT_QUIZ_REFRESH = 5  # seconds between page reruns that hand newly loaded questions to the player
+
+# ==================== QUERY CACHE ====================
+QUERY_CACHE_MAX_ENTRIES = 2000  # least recently used results are evicted past this
+
+@st.cache_resource
+def get_query_cache():
+    """Process-wide store for cached read-helper results, shared by all sessions"""
+    return {"entries": collections.OrderedDict(), "generations": collections.Counter(),
+            "hits": 0, "misses": 0, "lock": threading.Lock()}
+
+def evict_queries(entries, now):
+    """Drop expired results, then the least recently used ones past QUERY_CACHE_MAX_ENTRIES; caller holds the lock"""
+    for key in [key for key, entry in entries.items() if entry["expires"] <= now]:
+        del entries[key]
+    while len(entries) > QUERY_CACHE_MAX_ENTRIES:
+        entries.popitem(last=False)
+
+def cached_query(*tables, ttl=300, per_user=False):
+    """Cache a read helper's result per arguments until `ttl` seconds pass or one of `tables` is written
+    
+    With per_user=True the first argument is the user id, so a write for one user only
+    invalidates that user's entries. Cached DataFrames are shared: callers must not mutate them.
+    """
+    def decorator(func):
+        @functools.wraps(func)
+        def wrapper(*args, **kwargs):
+            cache = get_query_cache()
+            key = (func.__name__, args, tuple(sorted(kwargs.items())))
+            now = time.monotonic()
+            with cache["lock"]:
+                entry = cache["entries"].get(key)
+                if entry and entry["expires"] > now:
+                    cache["hits"] += 1
+                    cache["entries"].move_to_end(key)
+                    return entry["result"]
+                cache["misses"] += 1
+                generations = [cache["generations"][table] for table in tables]
+            with trace_span(f"db.{func.__name__}"):
+                result = func(*args, **kwargs)
+            with cache["lock"]:
+                # A write invalidated one of the tables while the query ran: the result may predate it
+                if generations != [cache["generations"][table] for table in tables]:
+                    return result
+                cache["entries"][key] = {"result": result, "expires": now + ttl, "tables": set(tables),
+                                         "user_id": args[0] if per_user and args else None}
+                cache["entries"].move_to_end(key)
+                evict_queries(cache["entries"], time.monotonic())
+            return result
+        return wrapper
+    return decorator
+
+def invalidate_queries(*tables, user_id=None):
+    """Drop cached results that read any of `tables`; limited to one user's entries when user_id is given"""
+    cache = get_query_cache()
+    with cache["lock"]:
+        cache["generations"].update(tables)
+        stale = [key for key, entry in cache["entries"].items()
+                 if entry["tables"] & set(tables)
+                 and (user_id is None or entry["user_id"] is None or entry["user_id"] == user_id)]
+        for key in stale:
+            del cache["entries"][key]
+        evict_queries(cache["entries"], time.monotonic())
+
+def query_cache_stats():
+    """Hit/miss counters and hit rate of the query cache"""
+    cache = get_query_cache()
+    lookups = cache["hits"] + cache["misses"]
+    return {"hits": cache["hits"], "misses": cache["misses"], "entries": len(cache["entries"]),
+            "hit_rate": cache["hits"] / lookups if lookups else 0.0}
+
 # ==================== LEARNING PLATFORM FUNCTIONS ====================
+@cached_query("courses", "enrollments", ttl=60, per_user=True)
 def get_user_courses(user_id=1):
     """Get courses enrolled by user"""
-    conn = sqlite3.connect('selectionway.db', check_same_thread=False)
     query = """
     SELECT c.id, c.name, c.description, c.materials_count, e.batch_date, e.validity_days 
     FROM courses c 
     JOIN enrollments e ON c.id = e.course_id 
     WHERE e.user_id = ?
     """
-    df = pd.read_sql_query(query, conn, params=(user_id,))
-    conn.close()
-    return df
+    with db_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(user_id,))
 
+@cached_query("courses", ttl=600)
 def get_all_courses():
     """Get all available courses"""
-    conn = sqlite3.connect('selectionway.db', check_same_thread=False)
-    df = pd.read_sql_query("SELECT * FROM courses", conn)
-    conn.close()
-    return df
+    with db_connection() as conn:
+        return pd.read_sql_query("SELECT * FROM courses", conn)
 
+@cached_query("study_materials", ttl=600)
 def get_study_materials(course_id):
     """Get study materials for a course"""
-    conn = sqlite3.connect('selectionway.db', check_same_thread=False)
     query = "SELECT * FROM study_materials WHERE course_id = ?"
-    df = pd.read_sql_query(query, conn, params=(course_id,))
-    conn.close()
-    return df
+    with db_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(course_id,))
+
+PAGE_SIZE = 20
+
+def like_pattern(search):
+    """LIKE pattern matching `search` anywhere, with LIKE wildcards in the input escaped"""
+    escaped = search.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+    return f"%{escaped}%"
+
+@cached_query("courses", "enrollments", ttl=60, per_user=True)
+def get_catalog_page(user_id, search="", enrolled=None, after_id=0, limit=PAGE_SIZE):
+    """One keyset page of the course catalog, with the user's enrollment flag
+    
+    enrolled=True/False keeps only courses the user is / isn't enrolled in.
+    """
+    query = """
+    SELECT c.*, e.user_id IS NOT NULL AS enrolled
+    FROM courses c
+    LEFT JOIN enrollments e ON e.course_id = c.id AND e.user_id = ?
+    WHERE c.id > ? AND c.name LIKE ? ESCAPE '\\'
+    """
+    if enrolled is not None:
+        query += " AND e.user_id IS " + ("NOT NULL" if enrolled else "NULL")
+    query += " ORDER BY c.id LIMIT ?"
+    with db_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(user_id, after_id, like_pattern(search), limit))
+
+@cached_query("courses", "enrollments", ttl=60, per_user=True)
+def get_user_courses_page(user_id, search="", after_id=0, limit=PAGE_SIZE):
+    """One keyset page of the user's enrolled courses"""
+    query = """
+    SELECT c.id, c.name, c.description, c.materials_count, e.batch_date, e.validity_days
+    FROM enrollments e
+    JOIN courses c ON c.id = e.course_id
+    WHERE e.user_id = ? AND c.id > ? AND c.name LIKE ? ESCAPE '\\'
+    ORDER BY c.id LIMIT ?
+    """
+    with db_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(user_id, after_id, like_pattern(search), limit))
+
+@cached_query("study_materials", ttl=600)
+def get_study_materials_page(course_id, search="", after_id=0, limit=PAGE_SIZE):
+    """One keyset page of a course's study materials"""
+    query = """
+    SELECT * FROM study_materials
+    WHERE course_id = ? AND id > ? AND name LIKE ? ESCAPE '\\'
+    ORDER BY id LIMIT ?
+    """
+    with db_connection() as conn:
+        return pd.read_sql_query(query, conn, params=(int(course_id), after_id, like_pattern(search), limit))
+
+@cached_query("courses", "enrollments", ttl=60, per_user=True)
+def get_user_summary(user_id):
+    """Dashboard counts computed in SQL instead of loading whole tables"""
+    with db_connection() as conn:
+        enrolled, materials = conn.execute(
+            """SELECT COUNT(*), COALESCE(SUM(c.materials_count), 0)
+               FROM enrollments e JOIN courses c ON c.id = e.course_id WHERE e.user_id = ?""",
+            (user_id,)).fetchone()
+        courses = conn.execute("SELECT COUNT(*) FROM courses").fetchone()[0]
+    return {"enrolled": enrolled, "materials": materials, "courses": courses}
 
+@traced("db")
 def enroll_user_in_course(user_id, course_id):
-    """Enroll user in a course"""
-    conn = sqlite3.connect('selectionway.db', check_same_thread=False)
-    c = conn.cursor()
-    
-    # Check if already enrolled
-    c.execute("SELECT * FROM enrollments WHERE user_id = ? AND course_id = ?", (user_id, course_id))
-    if not c.fetchone():
-        enroll_date = datetime.now().strftime("%Y-%m-%d")
-        batch_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")  # Start after 7 days
-        c.execute("INSERT INTO enrollments VALUES (?, ?, ?, ?, ?)", 
-                 (user_id, course_id, enroll_date, batch_date, 730))
-        conn.commit()
+    """Enroll user in a course; a single upsert, so re-enrolling is a no-op"""
+    enroll_date = datetime.now().strftime("%Y-%m-%d")
+    batch_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")  # Start after 7 days
+    with db_write() as conn:
+        conn.execute("""INSERT INTO enrollments VALUES (?, ?, ?, ?, ?)
+                        ON CONFLICT(user_id, course_id) DO NOTHING""",
+                     (user_id, course_id, enroll_date, batch_date, 730))
+    invalidate_queries("enrollments", user_id=user_id)
+
+# ==================== QUIZ RESULTS ====================
+QUIZ_WRITE_BATCH = 200       # finished quizzes per transaction at most
+QUIZ_WRITE_INTERVAL = 0.5    # seconds to gather a batch before committing
+QUIZ_RETRY_INTERVAL = 30     # seconds between retries of results spooled after a failed write
+QUIZ_SUBMIT_TIMEOUT = 5.0    # seconds a finished quiz waits for room in a full queue
+
+logger = logging.getLogger(__name__)
+
+@traced("db")
+def write_quiz_results(db_path, records):
+    """Insert finished quizzes and their per-question answers in one transaction"""
+    with db_write(db_path) as conn:
+        c = conn.cursor()
+        for record in records:
+            c.execute("INSERT INTO quiz_results (user_id, score, total_questions, time_taken, quiz_date, course_id) "
+                      "VALUES (?, ?, ?, ?, ?, ?)",
+                      (record["user_id"], record["score"], record["total_questions"],
+                       record["time_taken"], record["quiz_date"], record["course_id"]))
+            result_id = c.lastrowid
+            c.executemany("INSERT INTO quiz_answers VALUES (?, ?, ?, ?, ?, ?, ?)",
+                          [(result_id, *answer) for answer in record["answers"]])
+            apply_quiz_rollups(c, record["user_id"], record["course_id"], record["quiz_date"][:10],
+                               record["score"], record["total_questions"], record["time_taken"])
+    for user_id in {record["user_id"] for record in records}:
+        invalidate_queries("user_quiz_stats", "user_course_stats", user_id=user_id)
+
+def quiz_spool_path(db_path):
+    """JSONL file next to the database holding quiz results that couldn't be committed yet"""
+    return db_path + ".unsaved-quizzes.jsonl"
+
+def spool_quiz_results(db_path, records):
+    """Append records to the spool so a failed write never loses a finished quiz"""
+    try:
+        with open(quiz_spool_path(db_path), "a", encoding="utf-8") as f:
+            for record in records:
+                f.write(json.dumps(record) + "\n")
+    except Exception:
+        # Last resort: the records themselves go to the log so they can be re-entered by hand
+        logger.exception("Could not spool %d quiz result(s): %s", len(records), json.dumps(records))
+
+def commit_quiz_batch(db_path, batch):
+    """Write one batch, retrying transient errors; spool it if SQLite still refuses"""
+    for attempt in range(3):
+        try:
+            write_quiz_results(db_path, batch)
+            return
+        except Exception:
+            if attempt == 2:
+                logger.exception("Saving %d quiz result(s) failed; spooled to %s for retry",
+                                 len(batch), quiz_spool_path(db_path))
+                spool_quiz_results(db_path, batch)
+                return
+            time.sleep(0.5 * (attempt + 1))
+
+def replay_spooled_quiz_results(db_path):
+    """Retry results spooled by earlier failed writes; they stay spooled while SQLite refuses them"""
+    path = quiz_spool_path(db_path)
+    if not os.path.exists(path):
+        return
+    try:
+        # Only the writer thread appends to the spool, so nothing is added between read and remove
+        with open(path, encoding="utf-8") as f:
+            records = [json.loads(line) for line in f if line.strip()]
+        if records:
+            write_quiz_results(db_path, records)
+        os.remove(path)
+        logger.info("Saved %d spooled quiz result(s)", len(records))
+    except Exception:
+        logger.exception("Retrying spooled quiz results in %s failed", path)
+
+def run_quiz_result_writer(db_path, pending):
+    """Drain the queue forever, committing whatever arrived within QUIZ_WRITE_INTERVAL as one batch"""
+    next_retry = time.monotonic()
+    while True:
+        if time.monotonic() >= next_retry:
+            replay_spooled_quiz_results(db_path)
+            next_retry = time.monotonic() + QUIZ_RETRY_INTERVAL
+        try:
+            batch = [pending.get(timeout=QUIZ_RETRY_INTERVAL)]
+        except queue.Empty:
+            continue
+        deadline = time.monotonic() + QUIZ_WRITE_INTERVAL
+        try:
+            while len(batch) < QUIZ_WRITE_BATCH:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    batch.append(pending.get(timeout=remaining))
+                except queue.Empty:
+                    break
+            commit_quiz_batch(db_path, batch)
+        except Exception:
+            # Nothing may stop this thread, or every later quiz would queue up unsaved
+            logger.exception("Quiz result writer error")
+        finally:
+            for _ in batch:
+                pending.task_done()
+
+@st.cache_resource
+def get_quiz_result_queue(db_path, pid):
+    """Process-wide write-behind queue with its background writer thread"""
+    pending = queue.Queue(maxsize=10000)  # bounded: a stalled writer applies back-pressure
+    threading.Thread(target=run_quiz_result_writer, args=(db_path, pending), daemon=True,
+                     name="quiz-result-writer").start()
+    atexit.register(flush_quiz_results, db_path)
+    return pending
+
+def flush_quiz_results(db_path=DB_PATH, timeout=5.0):
+    """Wait until queued quiz results are committed; returns False if the timeout passed first"""
+    pending = get_quiz_result_queue(db_path, os.getpid())
+    deadline = time.monotonic() + timeout
+    while pending.unfinished_tasks:
+        if time.monotonic() > deadline:
+            return False
+        time.sleep(0.01)
+    return True
+
+def submit_quiz_result(user_id, quiz_data, time_taken, course_id=None, db_path=DB_PATH):
+    """Queue a finished quiz for the background writer; returns the score without waiting for SQLite
+    
+    Returns None if the queue stayed full for QUIZ_SUBMIT_TIMEOUT, so the caller can say so and retry.
+    """
+    answers = []
+    score = 0
+    for idx, question in enumerate(quiz_questions(quiz_data)):
+        selected = quiz_answer(quiz_data, idx)
+        is_correct = selected == question['correct_answer']
+        score += is_correct
+        answers.append((idx, selected, question['correct_answer'], int(is_correct),
+                        round(quiz_data['time_spent'][idx], 2), quiz_data['attempts'][idx]))
+    record = {
+        "user_id": user_id,
+        "course_id": None if course_id is None else int(course_id),
+        "score": score,
+        "total_questions": len(answers),
+        "time_taken": int(time_taken),
+        "quiz_date": datetime.now().strftime("%Y-%m-%d %H:%M:%S"),
+        "answers": answers
+    }
+    try:
+        get_quiz_result_queue(db_path, os.getpid()).put(record, timeout=QUIZ_SUBMIT_TIMEOUT)
+    except queue.Full:
+        logger.warning("Quiz result queue full; result for user %s not queued", user_id)
+        return None
+    return score
+
+# ==================== PROGRESS ROLLUPS ====================
+# Per user / course / day totals, maintained on every attempt insert so the
+# Progress Report reads a handful of primary-key rows instead of scanning history.
+
+def apply_quiz_rollups(c, user_id, course_id, day, score, total_questions, seconds):
+    """Fold one quiz attempt into the rollup tables"""
+    percent = score / total_questions * 100 if total_questions else 0
+    # SET expressions see the old row, so streak and day logic compare against the previous last_quiz_day
+    c.execute('''INSERT INTO user_quiz_stats VALUES (?, 1, ?, ?, ?, ?, 1, 1, ?)
+                 ON CONFLICT(user_id) DO UPDATE SET
+                     quizzes_taken = quizzes_taken + 1,
+                     total_score = total_score + excluded.total_score,
+                     total_questions = total_questions + excluded.total_questions,
+                     best_percent = MAX(best_percent, excluded.best_percent),
+                     total_seconds = total_seconds + excluded.total_seconds,
+                     current_streak = CASE
+                         WHEN excluded.last_quiz_day <= last_quiz_day THEN current_streak
+                         WHEN excluded.last_quiz_day = date(last_quiz_day, '+1 day') THEN current_streak + 1
+                         ELSE 1 END,
+                     active_days = active_days + (excluded.last_quiz_day > last_quiz_day),
+                     last_quiz_day = MAX(last_quiz_day, excluded.last_quiz_day)''',
+              (user_id, score, total_questions, percent, seconds, day))
+    c.execute('''INSERT INTO user_daily_stats VALUES (?, ?, 1, ?, ?, ?)
+                 ON CONFLICT(user_id, day) DO UPDATE SET
+                     quizzes_taken = quizzes_taken + 1,
+                     total_score = total_score + excluded.total_score,
+                     total_questions = total_questions + excluded.total_questions,
+                     total_seconds = total_seconds + excluded.total_seconds''',
+              (user_id, day, score, total_questions, seconds))
+    # An attempt older than the last quiz day (e.g. replayed from the spool) can fill a gap in the
+    # streak, which the running CASE above can't see: recount from the daily rows as the rebuild does
+    c.execute('''UPDATE user_quiz_stats SET
+                     active_days = (SELECT COUNT(*) FROM user_daily_stats WHERE user_id = ?1),
+                     current_streak = (
+                         WITH days AS (
+                             SELECT day, julianday(day) - ROW_NUMBER() OVER (ORDER BY day) AS run
+                             FROM user_daily_stats WHERE user_id = ?1)
+                         SELECT COUNT(*) FROM days WHERE run = (SELECT run FROM days ORDER BY day DESC LIMIT 1))
+                 WHERE user_id = ?1 AND last_quiz_day > ?2''',
+              (user_id, day))
+    if course_id is not None:
+        c.execute('''INSERT INTO user_course_stats VALUES (?, ?, 1, ?, ?, ?)
+                     ON CONFLICT(user_id, course_id) DO UPDATE SET
+                         quizzes_taken = quizzes_taken + 1,
+                         total_score = total_score + excluded.total_score,
+                         total_questions = total_questions + excluded.total_questions,
+                         total_seconds = total_seconds + excluded.total_seconds''',
+                  (user_id, course_id, score, total_questions, seconds))
+
+def rebuild_progress_rollups(c):
+    """Recompute every rollup from quiz_results, e.g. after a bug fix or a manual data repair"""
+    for table in ("user_quiz_stats", "user_course_stats", "user_daily_stats"):
+        c.execute(f"DELETE FROM {table}")
+    c.execute('''INSERT INTO user_daily_stats
+                 SELECT user_id, substr(quiz_date, 1, 10), COUNT(*), SUM(score), SUM(total_questions), SUM(time_taken)
+                 FROM quiz_results GROUP BY user_id, substr(quiz_date, 1, 10)''')
+    c.execute('''INSERT INTO user_course_stats
+                 SELECT user_id, course_id, COUNT(*), SUM(score), SUM(total_questions), SUM(time_taken)
+                 FROM quiz_results WHERE course_id IS NOT NULL GROUP BY user_id, course_id''')
+    # Current streak = length of the run of consecutive days ending at each user's last active day
+    c.execute('''INSERT INTO user_quiz_stats
+                 WITH days AS (
+                     SELECT user_id, day,
+                            julianday(day) - ROW_NUMBER() OVER (PARTITION BY user_id ORDER BY day) AS run
+                     FROM user_daily_stats),
+                 runs AS (
+                     SELECT user_id, run, COUNT(*) AS run_days FROM days GROUP BY user_id, run),
+                 last_run AS (
+                     -- bare `run` comes from the row holding MAX(day)
+                     SELECT user_id, run, MAX(day) AS last_day, COUNT(*) AS active_days FROM days GROUP BY user_id),
+                 totals AS (
+                     SELECT user_id, COUNT(*) AS quizzes, SUM(score) AS score, SUM(total_questions) AS questions,
+                            MAX(CASE WHEN total_questions THEN score * 100.0 / total_questions ELSE 0 END) AS best,
+                            SUM(time_taken) AS seconds
+                     FROM quiz_results GROUP BY user_id)
+                 -- Joins of grouped CTEs: correlated subqueries here re-ran the window once per quiz row
+                 SELECT t.user_id, t.quizzes, t.score, t.questions, t.best, t.seconds,
+                        s.run_days, l.active_days, l.last_day
+                 FROM totals t
+                 JOIN last_run l ON l.user_id = t.user_id
+                 JOIN runs s ON s.user_id = l.user_id AND s.run = l.run''')
+
+@cached_query("user_quiz_stats", ttl=600, per_user=True)
+def get_progress_summary(user_id):
+    """Overall quiz and study-time rollup for a user, or None before the first quiz"""
+    with db_connection() as conn:
+        row = conn.execute("SELECT * FROM user_quiz_stats WHERE user_id = ?", (user_id,)).fetchone()
+    if row is None:
+        return None
+    _, quizzes, score, questions, best, seconds, streak, active_days, last_day = row
+    # A streak only counts as current if the last quiz was today or yesterday
+    if last_day < (datetime.now() - timedelta(days=1)).strftime("%Y-%m-%d"):
+        streak = 0
+    return {"quizzes_taken": quizzes, "average_percent": score / questions * 100 if questions else 0,
+            "best_percent": best, "total_hours": seconds / 3600, "daily_average_hours": seconds / 3600 / active_days,
+            "current_streak": streak}
+
+@cached_query("user_course_stats", ttl=600, per_user=True)
+def get_course_progress(user_id):
+    """Per-course quiz accuracy for a user, keyed by course id"""
+    with db_connection() as conn:
+        rows = conn.execute("SELECT course_id, quizzes_taken, total_score, total_questions "
+                            "FROM user_course_stats WHERE user_id = ?", (user_id,)).fetchall()
+    return {course_id: {"quizzes_taken": quizzes, "percent": score / questions * 100 if questions else 0}
+            for course_id, quizzes, score, questions in rows}
+
+# ==================== QUESTION BANK ====================
+def normalize_question_text(question, options):
+    """Case, punctuation, spacing and option order-insensitive form used to spot the same question"""
+    text = f"{question} {' '.join(sorted(options.values()))}".lower()
+    return " ".join(re.sub(r'[^\w\s]', ' ', text).split())
+
+def question_text_hash(question, options):
+    """Dedupe key of a question: SHA-256 of its normalized text"""
+    return hashlib.sha256(normalize_question_text(question, options).encode()).hexdigest()
+
+@traced("db")
+def save_to_question_bank(pdf_sha256, questions, db_path=DB_PATH, first_number=1):
+    """Store parsed questions once per normalized text and link them to their source paper
+    
+    Questions are numbered within the paper from `first_number`, so a paper can be saved in
+    batches as it is read. Returns the question bank id of each question, in order.
+    """
+    with db_write(db_path) as conn:
+        return insert_bank_questions(conn.cursor(), pdf_sha256, questions, first_number)
+
+def insert_bank_questions(c, pdf_sha256, questions, first_number=1):
+    """save_to_question_bank inside the caller's transaction"""
+    added = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    rows = [(question_text_hash(q['question'], q['options']), q['question'], json.dumps(q['options']),
+             q['correct_answer'], added) for q in questions]
+    c.executemany("INSERT OR IGNORE INTO question_bank (text_hash, question, options, correct_answer, added_at) "
+                  "VALUES (?, ?, ?, ?, ?)", rows)
+    c.executemany("INSERT OR IGNORE INTO question_sources "
+                  "SELECT ?, ?, id FROM question_bank WHERE text_hash = ?",
+                  [(pdf_sha256, number, row[0]) for number, row in enumerate(rows, first_number)])
+    last_number = first_number + len(rows) - 1
+    ids = dict(c.execute('''SELECT question_number, question_id FROM question_sources
+                            WHERE pdf_sha256 = ? AND question_number BETWEEN ? AND ?''',
+                         (pdf_sha256, first_number, last_number)).fetchall())
+    return [ids[number] for number in range(first_number, last_number + 1)]
+
+def fts_query(text):
+    """Turn free text into a safe FTS5 query: all words must match, the last one as a prefix"""
+    words = re.findall(r'\w+', text)
+    if not words:
+        return None
+    return " ".join(f'"{word}"' for word in words[:-1]) + f' "{words[-1]}"*'
+
+@traced("db")
+def search_question_bank(text, limit=20, db_path=DB_PATH):
+    """Best-ranked bank questions matching `text`, with the number of papers each appeared in"""
+    query = fts_query(text)
+    if query is None:
+        return []
+    with db_connection(db_path) as conn:
+        rows = conn.execute('''SELECT b.id, b.question, b.options, b.correct_answer,
+                                      (SELECT COUNT(*) FROM question_sources s WHERE s.question_id = b.id)
+                               FROM question_bank_fts f JOIN question_bank b ON b.id = f.rowid
+                               WHERE question_bank_fts MATCH ? ORDER BY f.rank LIMIT ?''',
+                            (query, limit)).fetchall()
+    return [{"bank_id": bank_id, "question": question, "options": json.loads(options),
+             "correct_answer": correct_answer, "papers": papers}
+            for bank_id, question, options, correct_answer, papers in rows]
+
+@cached_query("question_bank", ttl=60)
+def question_bank_stats():
+    """Distinct questions and source papers in the bank"""
+    with db_connection() as conn:
+        questions = conn.execute("SELECT COUNT(*) FROM question_bank").fetchone()[0]
+        papers = conn.execute("SELECT COUNT(DISTINCT pdf_sha256) FROM question_sources").fetchone()[0]
+    return {"questions": questions, "papers": papers}
+
+# ==================== QUIZ SESSIONS ====================
+# Question text and options are held once per process in the question store, keyed by
+# question bank id. A session's quiz_data keeps the ids plus one small typed array per
+# piece of per-question state, so a 2,000-question mock test costs a few tens of KB.
+QUESTION_STORE_MAX = 50000  # records kept in memory; evicted ones are reloaded from question_bank
+
+@st.cache_resource
+def get_question_store(pid):
+    """Process-wide LRU of question records shared by every quiz session"""
+    return {"records": collections.OrderedDict(), "lock": threading.Lock()}
+
+def question_record(question):
+    """Store record of a classified, bank-saved question; option texts like "None of these" are interned"""
+    return {"bank_id": question['bank_id'], "question": question['question'],
+            "options": {letter: sys.intern(text) for letter, text in question['options'].items()},
+            "correct_answer": question['correct_answer'], "category": question['category'],
+            "difficulty": question['difficulty']}
+
+def store_questions(questions):
+    """Add bank-saved questions to the shared store; returns their records
     
-    conn.close()
+    A record already in the store is kept as it is: sessions may be part way through it.
+    """
+    records = []
+    store = get_question_store(os.getpid())
+    with store["lock"]:
+        for question in questions:
+            record = store["records"].setdefault(question['bank_id'], question_record(question))
+            store["records"].move_to_end(record['bank_id'])
+            records.append(record)
+        while len(store["records"]) > QUESTION_STORE_MAX:
+            store["records"].popitem(last=False)
+    return records
+
+def load_bank_questions(bank_ids, db_path=DB_PATH):
+    """Classified questions read back from question_bank, in no particular order"""
+    with db_connection(db_path) as conn:
+        rows = conn.execute('''SELECT id, question, options, correct_answer FROM question_bank
+                               WHERE id IN (SELECT value FROM json_each(?))''',
+                            (json.dumps(list(bank_ids)),)).fetchall()
+    questions = list(classify_questions(make_question(bank_id, question, json.loads(options), correct_answer)
+                                        for bank_id, question, options, correct_answer in rows))
+    for question in questions:
+        question['bank_id'] = question['id']
+    return questions
+
+def get_questions(bank_ids):
+    """Store records for bank ids, in order, reloading any the store has evicted"""
+    store = get_question_store(os.getpid())
+    with store["lock"]:
+        found = {bank_id: store["records"].get(bank_id) for bank_id in bank_ids}
+    missing = [bank_id for bank_id, record in found.items() if record is None]
+    if missing:
+        found.update((record['bank_id'], record) for record in store_questions(load_bank_questions(missing)))
+    return [found[bank_id] for bank_id in bank_ids]
+
+def new_quiz_session(**fields):
+    """quiz_data for a new attempt, with no questions yet"""
+    now = time.time()
+    return {
+        'question_ids': array.array('q'),   # question bank id per question
+        'answers': bytearray(),             # ord() of the chosen letter, 0 while unanswered
+        'marked': bytearray(),              # 1 when marked for review
+        'time_spent': array.array('f'),     # seconds
+        'attempts': array.array('H'),
+        'current_q': 0,
+        'quiz_started': True,
+        'start_time': now,
+        'question_start_time': now,
+        'quiz_completed': False,
+        **fields
+    }
+
+def add_quiz_questions(quiz_data, bank_ids):
+    """Append questions to a session"""
+    count = len(bank_ids)
+    quiz_data['answers'].extend(bytes(count))
+    quiz_data['marked'].extend(bytes(count))
+    quiz_data['time_spent'].extend([0.0] * count)
+    quiz_data['attempts'].extend([0] * count)
+    # Ids last: the player thread never sees a question whose state slots don't exist yet
+    quiz_data['question_ids'].extend(bank_ids)
+
+def add_bank_questions(quiz_data, pdf_sha256, questions):
+    """Save parsed questions to the bank, share them through the store and append them to a session"""
+    if not questions:
+        return
+    bank_ids = save_to_question_bank(pdf_sha256, questions, first_number=quiz_length(quiz_data) + 1)
+    # A deduplicated id may belong to an earlier copy with other option order or answer key,
+    # so the store is filled from the question_bank row the id refers to, not from this parse
+    get_questions(bank_ids)
+    add_quiz_questions(quiz_data, bank_ids)
+
+def quiz_length(quiz_data):
+    """Number of questions in a session so far"""
+    return len(quiz_data['question_ids'])
+
+def quiz_question(quiz_data, idx):
+    """Store record of one question in a session"""
+    return get_questions([quiz_data['question_ids'][idx]])[0]
+
+def quiz_questions(quiz_data):
+    """Store records of every question in a session, in order"""
+    return get_questions(quiz_data['question_ids'])
+
+def quiz_answer(quiz_data, idx):
+    """Chosen option letter of a question, or None"""
+    code = quiz_data['answers'][idx]
+    return chr(code) if code else None
+
+# ==================== STUDY MATERIAL BLOBS ====================
+# Files live once per content hash under BLOB_DIR/ab/cd/<sha256>; study_materials rows point at them
+BLOB_DIR = os.environ.get("SELECTIONWAY_BLOBS", "blobs")
+
+def blob_path(sha256):
+    """Sharded location of a stored file, so no directory grows past a few thousand entries"""
+    return os.path.join(BLOB_DIR, sha256[:2], sha256[2:4], sha256)
+
+def store_blob(upload):
+    """Copy an upload into the blob store in chunks while hashing it; returns (sha256, size_bytes)
+    
+    Content already in the store is not written twice.
+    """
+    os.makedirs(BLOB_DIR, exist_ok=True)
+    digest, size = hashlib.sha256(), 0
+    # Temp file inside BLOB_DIR so the final rename never crosses filesystems
+    fd, tmp_path = tempfile.mkstemp(dir=BLOB_DIR, prefix=".upload-")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            upload.seek(0)
+            while chunk := upload.read(SPOOL_CHUNK_BYTES):
+                digest.update(chunk)
+                f.write(chunk)
+                size += len(chunk)
+        sha256 = digest.hexdigest()
+        path = blob_path(sha256)
+        if os.path.exists(path):
+            os.remove(tmp_path)
+        else:
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+        raise
+    return sha256, size
+
+def open_blob(sha256):
+    """Binary reader over a stored file"""
+    return open(blob_path(sha256), "rb")
+
+@traced("db")
+def add_study_material(course_id, upload):
+    """Store an uploaded file and list it under a course; returns the new material id"""
+    sha256, size = store_blob(upload)
+    name = os.path.basename(upload.name)
+    file_type = os.path.splitext(name)[1].lstrip(".").upper() or "FILE"
+    mime_type = mimetypes.guess_type(name)[0] or "application/octet-stream"
+    with db_write() as conn:
+        material_id = conn.execute(
+            """INSERT INTO study_materials (course_id, name, file_type, upload_date, sha256, size_bytes, mime_type)
+               VALUES (?, ?, ?, ?, ?, ?, ?)""",
+            (int(course_id), name, file_type, datetime.now().strftime("%Y-%m-%d"), sha256, size, mime_type)).lastrowid
+    invalidate_queries("study_materials")
+    return material_id
+
+def format_size(size_bytes):
+    """Human-readable file size"""
+    size = float(size_bytes)
+    for unit in ("B", "KB", "MB", "GB"):
+        if size < 1024 or unit == "GB":
+            return f"{size:.0f} {unit}" if unit == "B" else f"{size:.1f} {unit}"
+        size /= 1024
+
+# ==================== STUDENT IMPORT ====================
+# Admission batches arrive as spreadsheets with one row per student (and course): rows are
+# streamed from the file, validated, and written IMPORT_BATCH at a time in one transaction.
+IMPORT_BATCH = 10000
+IMPORT_MAX_REJECTS = 1000  # rejected rows kept for the report; the rest are only counted
+IMPORT_COLUMNS = ("name", "email", "phone", "course_id", "batch_date", "validity_days")
+IMPORT_REQUIRED = ("name", "email")
+EMAIL_PATTERN = re.compile(r'^[^@\s]+@[^@\s]+\.[^@\s]+$')
+
+def iter_sheet_rows(path):
+    """(row number, header-keyed dict) for each row of a .xlsx (first sheet, read-only streaming) or .csv file"""
+    extension = os.path.splitext(path)[1].lower()
+    if extension not in (".csv", ".xlsx", ".xlsm"):
+        raise ValueError("expected a .xlsx or .csv file")
+    if extension == ".csv":
+        with open(path, newline="", encoding="utf-8-sig") as f:
+            yield from iter_keyed_rows(csv.reader(f))
+        return
+    workbook = openpyxl.load_workbook(path, read_only=True, data_only=True)
+    try:
+        yield from iter_keyed_rows(workbook.worksheets[0].iter_rows(values_only=True))
+    finally:
+        workbook.close()
+
+def iter_keyed_rows(rows):
+    """Pair each row with the lower-cased header row and its sheet row number; blank rows are skipped"""
+    header = [str(cell or "").strip().lower() for cell in next(rows, ())]
+    missing = [column for column in IMPORT_REQUIRED if column not in header]
+    if missing:
+        raise ValueError(f"missing column(s): {', '.join(missing)}")
+    # Row 1 is the header; numbering before skipping blanks keeps it in step with the spreadsheet
+    for row_number, row in enumerate(rows, 2):
+        if any(cell not in (None, "") for cell in row):
+            yield row_number, dict(zip(header, row))
+
+def cell_text(value):
+    """Spreadsheet cell as stripped text; dates become YYYY-MM-DD and whole floats lose their .0"""
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.strftime("%Y-%m-%d")
+    if isinstance(value, float) and value.is_integer():
+        return str(int(value))
+    return str(value).strip()
+
+def validate_import_row(row, course_ids, enroll_date, default_batch_date):
+    """(user, enrollment or None) tuples for one row, or raise ValueError with the reason"""
+    values = {column: cell_text(row.get(column)) for column in IMPORT_COLUMNS}
+    email = values["email"].lower()
+    if not values["name"]:
+        raise ValueError("name is empty")
+    if not EMAIL_PATTERN.match(email):
+        raise ValueError(f"invalid email {values['email']!r}")
+    phone = re.sub(r'[\s-]', '', values["phone"])
+    if phone and not re.fullmatch(r'\+?\d{10,13}', phone):
+        raise ValueError(f"invalid phone {values['phone']!r}")
+    user = (values["name"], email, phone or None, email)
+    if not values["course_id"]:
+        return user, None
+    
+    if not values["course_id"].isdigit() or int(values["course_id"]) not in course_ids:
+        raise ValueError(f"unknown course {values['course_id']!r}")
+    batch_date = values["batch_date"] or default_batch_date
+    try:
+        datetime.strptime(batch_date, "%Y-%m-%d")
+    except ValueError:
+        raise ValueError(f"invalid batch_date {values['batch_date']!r}") from None
+    validity = values["validity_days"] or "730"
+    if not validity.isdigit():
+        raise ValueError(f"invalid validity_days {values['validity_days']!r}")
+    return user, (email, int(values["course_id"]), enroll_date, batch_date, int(validity))
+
+def write_import_batch(users, enrollments, db_path=DB_PATH):
+    """Insert one batch of students and enrollments in a single transaction; returns rows added of each"""
+    with db_write(db_path) as conn:
+        before = conn.total_changes
+        # Students are matched by email, so re-importing a file doesn't duplicate anyone
+        conn.executemany("INSERT INTO users (name, email, phone) SELECT ?, ?, ? "
+                         "WHERE NOT EXISTS (SELECT 1 FROM users WHERE email = ?)", users)
+        added_users = conn.total_changes - before
+        conn.executemany("INSERT OR IGNORE INTO enrollments "
+                         "SELECT (SELECT MIN(id) FROM users WHERE email = ?), ?, ?, ?, ?", enrollments)
+        added_enrollments = conn.total_changes - before - added_users
+    return added_users, added_enrollments
+
+@traced("db")
+def import_students(path, batch_size=IMPORT_BATCH, db_path=DB_PATH, progress=None):
+    """Stream students and enrollments from a .xlsx or .csv file into the database
+    
+    Returns counts, throughput and up to IMPORT_MAX_REJECTS rejected rows as
+    (row number, reason); `progress` is called with the running stats after each batch.
+    """
+    start = time.perf_counter()
+    with db_connection(db_path) as conn:
+        course_ids = {course_id for (course_id,) in conn.execute("SELECT id FROM courses")}
+    enroll_date = datetime.now().strftime("%Y-%m-%d")
+    default_batch_date = (datetime.now() + timedelta(days=7)).strftime("%Y-%m-%d")
+    stats = {"rows": 0, "users_added": 0, "enrollments_added": 0, "rejected": 0, "rejects": []}
+    
+    rows = iter_sheet_rows(path)
+    while batch := list(itertools.islice(rows, batch_size)):
+        users, enrollments = [], []
+        for row_number, row in batch:
+            try:
+                user, enrollment = validate_import_row(row, course_ids, enroll_date, default_batch_date)
+            except ValueError as e:
+                stats["rejected"] += 1
+                if len(stats["rejects"]) < IMPORT_MAX_REJECTS:
+                    stats["rejects"].append((row_number, str(e)))
+                continue
+            users.append(user)
+            if enrollment:
+                enrollments.append(enrollment)
+        added_users, added_enrollments = write_import_batch(users, enrollments, db_path)
+        stats["rows"] += len(batch)
+        stats["users_added"] += added_users
+        stats["enrollments_added"] += added_enrollments
+        if progress:
+            progress(stats)
+    
+    invalidate_queries("users", "enrollments")
+    stats["seconds"] = time.perf_counter() - start
+    stats["rows_per_second"] = stats["rows"] / stats["seconds"] if stats["seconds"] else 0.0
+    return stats
+
+# ==================== COHORT EXPORT ====================
+# Reports are streamed from a SQLite cursor straight into the output file, a few thousand
+# rows at a time, so exporting a million attempts never builds a DataFrame.
+EXPORT_FETCH_ROWS = 5000
+EXCEL_MAX_ROWS = 1048576  # rows per worksheet, header included; longer reports continue on a new sheet
+EXPORT_FORMATS = {"Excel": "xlsx", "CSV": "csv"}
+COHORT_REPORTS = {
+    "Quiz attempts": (
+        ("Student ID", "Student", "Email", "Course", "Quiz date", "Score", "Questions", "Percent", "Time (s)"),
+        """SELECT q.user_id, u.name, u.email, c.name, q.quiz_date, q.score, q.total_questions,
+                  ROUND(100.0 * q.score / NULLIF(q.total_questions, 0), 1), q.time_taken
+           FROM quiz_results q
+           LEFT JOIN users u ON u.id = q.user_id
+           LEFT JOIN courses c ON c.id = q.course_id
+           WHERE ?1 IS NULL OR q.course_id = ?1
+           ORDER BY q.user_id, q.quiz_date"""),
+    "Course progress": (
+        ("Student ID", "Student", "Email", "Course", "Enrolled", "Batch starts", "Validity (days)",
+         "Quizzes taken", "Percent correct", "Hours practised"),
+        """SELECT e.user_id, u.name, u.email, c.name, e.enroll_date, e.batch_date, e.validity_days,
+                  COALESCE(s.quizzes_taken, 0), ROUND(100.0 * s.total_score / NULLIF(s.total_questions, 0), 1),
+                  ROUND(COALESCE(s.total_seconds, 0) / 3600.0, 2)
+           FROM enrollments e
+           LEFT JOIN users u ON u.id = e.user_id
+           LEFT JOIN courses c ON c.id = e.course_id
+           LEFT JOIN user_course_stats s ON s.user_id = e.user_id AND s.course_id = e.course_id
+           WHERE ?1 IS NULL OR e.course_id = ?1
+           ORDER BY e.user_id, e.course_id"""),
+}
+
+def iter_report_rows(report, course_id=None, db_path=DB_PATH):
+    """Rows of a cohort report, fetched from the cursor in EXPORT_FETCH_ROWS chunks"""
+    query = COHORT_REPORTS[report][1]
+    with db_connection(db_path) as conn:
+        cursor = conn.execute(query, (None if course_id is None else int(course_id),))
+        while rows := cursor.fetchmany(EXPORT_FETCH_ROWS):
+            yield from rows
+
+def write_report_csv(out, headers, rows):
+    """Write rows to a text file as CSV; returns the row count"""
+    writer = csv.writer(out)
+    writer.writerow(headers)
+    count = 0
+    while chunk := list(itertools.islice(rows, EXPORT_FETCH_ROWS)):
+        writer.writerows(chunk)
+        count += len(chunk)
+    return count
+
+def write_report_xlsx(path, title, headers, rows):
+    """Write rows to a write-only workbook, which streams each sheet to disk; returns the row count"""
+    workbook = openpyxl.Workbook(write_only=True)
+    count = 0
+    sheet = None
+    for row in rows:
+        if count % (EXCEL_MAX_ROWS - 1) == 0:
+            sheet = workbook.create_sheet(title if count == 0 else f"{title} ({count // (EXCEL_MAX_ROWS - 1) + 1})")
+            sheet.append(headers)
+        sheet.append(row)
+        count += 1
+    if sheet is None:
+        workbook.create_sheet(title).append(headers)
+    workbook.save(path)
+    return count
+
+@traced("export")
+def export_report(report, file_format, course_id=None, db_path=DB_PATH):
+    """Build a cohort report in a temp file and return a reader over it; the file is gone once the reader closes"""
+    headers = COHORT_REPORTS[report][0]
+    rows = iter_report_rows(report, course_id, db_path)
+    fd, path = tempfile.mkstemp(prefix="selectionway-export-", suffix=f".{file_format}")
+    try:
+        if file_format == "csv":
+            with os.fdopen(fd, "w", newline="", encoding="utf-8") as out:
+                write_report_csv(out, headers, rows)
+        else:
+            os.close(fd)
+            write_report_xlsx(path, report, headers, rows)
+        reader = open(path, "rb")
+    finally:
+        os.remove(path)
+    return reader
+
+# ==================== CONVERSION JOBS ====================
+# Uploads from every session share CONVERSION_SLOTS converter threads and one pool of
+# PDF_WORKERS extraction processes; uploads beyond that wait in a bounded queue.
+CONVERSION_SLOTS = int(os.environ.get("CONVERSION_SLOTS", 2))
+CONVERSION_QUEUE_LIMIT = int(os.environ.get("CONVERSION_QUEUE_LIMIT", 50))
+JOB_RETENTION_SECONDS = 3600
+
+@st.cache_resource
+def get_conversion_jobs(pid):
+    """Process-wide job registry and admission queue, with its converter threads"""
+    jobs = {"jobs": {}, "queued": collections.deque(), "lock": threading.Lock(), "pool": None,
+            "pending": queue.Queue(maxsize=CONVERSION_QUEUE_LIMIT)}
+    for slot in range(CONVERSION_SLOTS):
+        threading.Thread(target=run_conversion_worker, args=(jobs,), daemon=True,
+                         name=f"pdf-converter-{slot}").start()
+    return jobs
+
+def get_extraction_pool(jobs):
+    """The shared extraction process pool, created on first use"""
+    with jobs["lock"]:
+        if jobs["pool"] is None:
+            jobs["pool"] = fork_process_pool(PDF_WORKERS)
+        return jobs["pool"]
+
+def discard_extraction_pool(jobs, broken):
+    """Drop a pool that raised BrokenProcessPool so the next job starts a fresh one"""
+    with jobs["lock"]:
+        if jobs["pool"] is broken:
+            jobs["pool"] = None
+    broken.shutdown(wait=False, cancel_futures=True)
+
+def run_conversion_job(jobs, job):
+    """Convert one queued job, unless it was cancelled while waiting"""
+    with jobs["lock"]:
+        if job["id"] in jobs["queued"]:
+            jobs["queued"].remove(job["id"])
+        if not job["cancel"].is_set():
+            job["status"], job["started_at"] = "running", time.time()
+    
+    if job["status"] == "running":
+        TRACE_SESSION.id = job["session"]
+        pool = None
+        try:
+            pool = get_extraction_pool(jobs)
+            stream_quiz_from_pdf(job["pdf_path"], job["quiz_data"], pool=pool, cancel=job["cancel"])
+        except BrokenProcessPool:
+            # A worker died (e.g. killed for memory); this job fails, later ones get a new pool
+            discard_extraction_pool(jobs, pool)
+        finally:
+            TRACE_SESSION.id = None
+
+def finish_conversion_job(jobs, job):
+    """Record how a job ended, delete its spooled PDF and forget jobs past JOB_RETENTION_SECONDS"""
+    quiz_data = job["quiz_data"]
+    with jobs["lock"]:
+        job["status"] = ("cancelled" if job["cancel"].is_set() else
+                         "failed" if quiz_data.get('load_error') else "done")
+        job["finished_at"] = time.time()
+        expired = [job_id for job_id, old in jobs["jobs"].items()
+                   if old.get("finished_at", time.time()) < time.time() - JOB_RETENTION_SECONDS]
+        for job_id in expired:
+            del jobs["jobs"][job_id]
+    try:
+        os.remove(job["pdf_path"])
+    except FileNotFoundError:
+        pass
+
+def run_conversion_worker(jobs):
+    """Take queued jobs one at a time, forever"""
+    while True:
+        job = jobs["pending"].get()
+        try:
+            run_conversion_job(jobs, job)
+        except Exception as e:
+            # Nothing may stop this thread: each one is a CONVERSION_SLOTS slot until restart
+            logger.exception("Conversion job %s failed", job["id"])
+            if not job["quiz_data"].get('load_error'):
+                job["quiz_data"]['load_error'] = f"{type(e).__name__}: {e}"
+            job["quiz_data"]['loading'] = False
+        try:
+            finish_conversion_job(jobs, job)
+        except Exception:
+            logger.exception("Cleaning up conversion job %s failed", job["id"])
+        finally:
+            jobs["pending"].task_done()
+
+def submit_conversion_job(pdf_file, quiz_data):
+    """Queue a PDF for conversion into quiz_data; returns the job id, or None when the queue is full
+    
+    The upload is spooled to a temp file straight away so queued jobs don't hold PDFs in memory.
+    """
+    jobs = get_conversion_jobs(os.getpid())
+    if jobs["pending"].full():
+        return None
+    job = {"id": uuid.uuid4().hex[:12], "status": "queued", "quiz_data": quiz_data, "pdf_path": spool_pdf(pdf_file),
+           "cancel": threading.Event(), "session": current_session_id(), "submitted_at": time.time()}
+    with jobs["lock"]:
+        try:
+            jobs["pending"].put_nowait(job)
+        except queue.Full:
+            os.remove(job["pdf_path"])
+            return None
+        jobs["jobs"][job["id"]] = job
+        jobs["queued"].append(job["id"])
+    quiz_data['job_id'] = job["id"]
+    return job["id"]
+
+def cancel_conversion_job(job_id):
+    """Stop a job after the page in progress; a queued job never starts"""
+    jobs = get_conversion_jobs(os.getpid())
+    with jobs["lock"]:
+        job = jobs["jobs"].get(job_id)
+        if job is None:
+            return
+        job["cancel"].set()
+        if job["status"] == "queued":
+            # It leaves the admission queue when a converter reaches it; release the session now
+            jobs["queued"].remove(job_id)
+            job["status"] = "cancelled"
+            job["quiz_data"]['loading'] = False
+
+def conversion_job_status(job_id):
+    """Status, queue position and page progress of a job, or None once it has expired"""
+    jobs = get_conversion_jobs(os.getpid())
+    with jobs["lock"]:
+        job = jobs["jobs"].get(job_id)
+        if job is None:
+            return None
+        quiz_data = job["quiz_data"]
+        return {
+            "status": job["status"],
+            "position": jobs["queued"].index(job_id) + 1 if job_id in jobs["queued"] else 0,
+            "running": sum(other["status"] == "running" for other in jobs["jobs"].values()),
+            "queued": len(jobs["queued"]),
+            "pages_done": quiz_data['pages_done'] + len(quiz_data['page_errors']),
+            "pages_total": quiz_data.get('pages_total'),
+            "questions": quiz_length(quiz_data)
+        }
+
+ensure_db_schema(DB_PATH, MIGRATIONS)
+ensure_db_schema(PDF_CACHE_DB, PDF_CACHE_MIGRATIONS)
+
+# ==================== BATCH CONVERTER ====================
+# `python app.py convert DIR` loads an archive of papers without the UI: one paper per
+# worker process, results committed CONVERT_BATCH papers per transaction. A paper counts
+# as done only once its questions are committed, so an interrupted run resumes where the
+# last committed batch ended.
+CONVERT_BATCH = 20
+
+def iter_paper_paths(directory):
+    """Every .pdf under a directory, in a stable order"""
+    for root, dirs, files in os.walk(directory):
+        dirs.sort()
+        for name in sorted(files):
+            if name.lower().endswith(".pdf"):
+                yield os.path.join(root, name)
+
+def convert_paper(path):
+    """Extract and parse one paper; runs in a converter process"""
+    start = time.perf_counter()
+    text, errors = io.StringIO(), []
+    # Papers are already spread across processes; splitting a paper's pages too would oversubscribe
+    pages = write_text_from_pdf(path, text, workers=1, errors=errors)
+    return {"questions": fast_parse_pdf_content(text.getvalue()), "pages": pages + len(errors),
+            "page_errors": errors, "seconds": time.perf_counter() - start}
+
+def save_converted_papers(papers, db_path=DB_PATH):
+    """Commit a batch of converted papers and their questions in one transaction"""
+    converted_at = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
+    with db_write(db_path) as conn:
+        c = conn.cursor()
+        for paper in papers:
+            insert_bank_questions(c, paper['sha256'], paper['questions'])
+        c.executemany("INSERT OR REPLACE INTO converted_papers VALUES (?, ?, ?, ?, ?, ?)",
+                      [(paper['sha256'], paper['path'], paper['pages'], len(paper['questions']),
+                        len(paper['page_errors']), converted_at) for paper in papers])
+    invalidate_queries("question_bank")
+
+def converted_paper_hashes(retry_errors=False, db_path=DB_PATH):
+    """Hashes of papers to skip; with retry_errors, papers that had unreadable pages are converted again"""
+    query = "SELECT pdf_sha256 FROM converted_papers"
+    if retry_errors:
+        query += " WHERE page_errors = 0"
+    with db_connection(db_path) as conn:
+        return {sha256 for (sha256,) in conn.execute(query)}
+
+def run_batch_conversion(directory, processes=None, batch_size=CONVERT_BATCH, retry_errors=False,
+                         db_path=DB_PATH, report=print):
+    """Convert every new paper under `directory` into the question bank; returns run statistics"""
+    processes = processes or PDF_WORKERS
+    start = time.perf_counter()
+    stats = {"found": 0, "skipped": 0, "converted": 0, "failed": 0, "pages": 0, "questions": 0,
+             "interrupted": False}
+    done = converted_paper_hashes(retry_errors, db_path)
+    
+    def new_papers():
+        for path in iter_paper_paths(directory):
+            stats["found"] += 1
+            sha256 = pdf_sha256(path)
+            if sha256 in done:
+                stats["skipped"] += 1
+                continue
+            done.add(sha256)  # the same file twice in one run is converted once
+            yield path, sha256
+    
+    def flush(batch):
+        if batch:
+            save_converted_papers(batch, db_path)
+            stats["converted"] += len(batch)
+            stats["pages"] += sum(paper['pages'] for paper in batch)
+            stats["questions"] += sum(len(paper['questions']) for paper in batch)
+            batch.clear()
+    
+    pool = fork_process_pool(processes)
+    papers, running, batch = new_papers(), {}, []
+    try:
+        while True:
+            # A couple of papers queued per process keeps workers busy without hashing the whole archive up front
+            for path, sha256 in itertools.islice(papers, 2 * processes - len(running)):
+                running[pool.submit(convert_paper, path)] = (path, sha256)
+            if not running:
+                break
+            finished, _ = concurrent.futures.wait(running, return_when=concurrent.futures.FIRST_COMPLETED)
+            for future in finished:
+                path, sha256 = running.pop(future)
+                try:
+                    paper = future.result()
+                except Exception as e:
+                    stats["failed"] += 1
+                    report(f"✗ {path}: {type(e).__name__}: {e}")
+                    continue
+                for page_no, error in paper['page_errors']:
+                    report(f"! {path}: page {page_no} skipped: {error}")
+                batch.append(dict(paper, path=path, sha256=sha256))
+                report(f"✓ {path}: {len(paper['questions'])} questions from {paper['pages']} pages "
+                       f"in {paper['seconds']:.1f}s")
+                if len(batch) >= batch_size:
+                    flush(batch)
+    except KeyboardInterrupt:
+        stats["interrupted"] = True
+    finally:
+        pool.shutdown(wait=not stats["interrupted"], cancel_futures=True)
+        # Papers converted before an interrupt are still committed; the rest are redone next run
+        flush(batch)
+    
+    stats["seconds"] = time.perf_counter() - start
+    return stats
 
 # ==================== STREAMLIT APP ====================
 def main():
@@ -341,6 +2078,7 @@ def main():
     """, unsafe_allow_html=True)
     
     # Initialize session state
+    st.session_state.script_runs = st.session_state.get('script_runs', 0) + 1
     if 'user_id' not in st.session_state:
         st.session_state.user_id = 1
     if 'user_name' not in st.session_state:
@@ -387,6 +2125,12 @@ def main():
         st.session_state.sound_enabled = not st.session_state.sound_enabled
         st.rerun()
     
+    cache_stats = query_cache_stats()
+    st.sidebar.caption(f"🗄️ Query cache: {cache_stats['hit_rate']:.0%} hits "
+                       f"({cache_stats['hits']}/{cache_stats['hits'] + cache_stats['misses']})")
+    if st.sidebar.toggle("⚡ Performance panel", key="show_performance"):
+        show_performance_panel()
+    
     # Page Routing
     if page == "🏠 Home Dashboard":
         show_home_dashboard()
@@ -402,6 +2146,124 @@ def main():
         show_progress_report()
 
 # ==================== PAGE FUNCTIONS ====================
+DASHBOARD_COURSES = 6
+
+def show_performance_panel():
+    """Sidebar summary of where time went, with a JSON-lines export of the raw events"""
+    with st.sidebar.expander("⚡ Performance", expanded=True):
+        cache_stats = query_cache_stats()
+        pdf_stats = get_pdf_cache_stats()
+        pdf_lookups = pdf_stats["hits"] + pdf_stats["misses"]
+        col1, col2, col3 = st.columns(3)
+        col1.metric("Reruns", st.session_state.script_runs)
+        col2.metric("Query hits", f"{cache_stats['hit_rate']:.0%}")
+        col3.metric("PDF hits", f"{pdf_stats['hits'] / pdf_lookups:.0%}" if pdf_lookups else "–")
+        
+        all_sessions = st.checkbox("All sessions", key="perf_all_sessions")
+        events = trace_events(None if all_sessions else current_session_id())
+        st.dataframe(trace_summary(events), hide_index=True, use_container_width=True)
+        
+        pages = [event for event in events if event["stage"] == "pdf.page"]
+        if pages:
+            ocr_pages = [event for event in pages if event.get("ocr")]
+            st.caption(f"📄 {len(pages)} pages extracted, {len(ocr_pages)} via OCR "
+                       f"({sum(event.get('ocr_ms', 0) for event in ocr_pages) / 1000:.1f}s in OCR)")
+        
+        st.download_button("📤 Export JSON lines", trace_jsonl(events), file_name="selectionway-trace.jsonl",
+                           mime="application/x-ndjson", use_container_width=True)
+
+def keyset_page(key, fetch, filters):
+    """Fetch the current page for pager `key`; the page stack restarts when `filters` change
+    
+    `fetch(after_id=..., limit=...)` must return rows ordered by id. One extra row is
+    requested to learn whether a next page exists without a COUNT query.
+    """
+    pager = st.session_state.setdefault(f"{key}_pager", {"filters": filters, "starts": [0]})
+    if pager["filters"] != filters:
+        pager["filters"], pager["starts"] = filters, [0]
+    
+    rows = fetch(after_id=pager["starts"][-1], limit=PAGE_SIZE + 1)
+    return rows.iloc[:PAGE_SIZE], len(rows) > PAGE_SIZE
+
+def pager_controls(key, page, has_next):
+    """Prev/Next buttons for a keyset pager; callbacks move the page before the rerun"""
+    starts = st.session_state[f"{key}_pager"]["starts"]
+    col1, col2, col3 = st.columns([1, 2, 1])
+    with col1:
+        st.button("⬅️ Prev", key=f"{key}_prev", disabled=len(starts) == 1, on_click=starts.pop,
+                  use_container_width=True)
+    with col2:
+        st.caption(f"Page {len(starts)}")
+    with col3:
+        st.button("Next ➡️", key=f"{key}_next", disabled=not has_next or page.empty, on_click=starts.append,
+                  args=(int(page['id'].iloc[-1]) if not page.empty else 0,), use_container_width=True)
+
+def render_cards(cards):
+    """Send a page of HTML cards to the browser as a single element"""
+    st.markdown("\n".join(cards), unsafe_allow_html=True)
+
+def enrolled_course_card(course):
+    """Card for a course on the dashboard"""
+    return f"""
+    <div class="course-card">
+        <h3>{html.escape(course['name'])}</h3>
+        <p>{html.escape(course['description'] or '')}</p>
+        <div style="display: flex; justify-content: space-between; align-items: center;">
+            <span>📖 {course['materials_count']} Study Materials</span>
+            <span>🕐 Batch starts: {html.escape(str(course['batch_date']))}</span>
+        </div>
+    </div>
+    """
+
+def catalog_course_card(course):
+    """Card for a course in the catalog"""
+    badge = '<span>✅ Enrolled</span>' if course['enrolled'] else ''
+    return f"""
+    <div class="course-card">
+        <h3>{html.escape(course['name'])}</h3>
+        <p>{html.escape(course['description'] or '')}</p>
+        <div style="display: flex; gap: 2rem; margin-top: 1rem;">
+            <span>📖 {course['materials_count']} Materials</span>
+            <span>👥 {course['students_count']} Students</span>
+            {badge}
+        </div>
+    </div>
+    """
+
+def batch_card(batch):
+    """Card for one of the user's batches"""
+    return f"""
+    <div class="course-card">
+        <h3>🎯 {html.escape(batch['name'])}</h3>
+        <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem; margin-top: 1rem;">
+            <div>
+                <strong>Start Date</strong><br>
+                📅 {html.escape(str(batch['batch_date']))}
+            </div>
+            <div>
+                <strong>Validity</strong><br>
+                ⏳ {batch['validity_days']} days
+            </div>
+            <div>
+                <strong>Materials</strong><br>
+                📚 {batch['materials_count']} files
+            </div>
+        </div>
+    </div>
+    """
+
+def material_row(material):
+    """Table row for a study material"""
+    return f"""
+    <tr>
+        <td><strong>{html.escape(material['name'])}</strong></td>
+        <td>{html.escape(str(material['upload_date']))}</td>
+        <td>📄 {html.escape(material['file_type'] or '')}</td>
+        <td>{format_size(material['size_bytes']) if pd.notna(material['size_bytes']) else '—'}</td>
+    </tr>
+    """
+
+@traced("page")
 def show_home_dashboard():
     st.markdown('<div class="main-header">🎓 Welcome to SelectionWay</div>', unsafe_allow_html=True)
     
@@ -411,15 +2273,15 @@ def show_home_dashboard():
     # Quick Stats
     col1, col2, col3, col4 = st.columns(4)
     
-    user_courses = get_user_courses(st.session_state.user_id)
-    all_courses = get_all_courses()
+    user_id = st.session_state.user_id
+    summary = get_user_summary(user_id)
     
     with col1:
-        st.metric("Enrolled Courses", len(user_courses))
+        st.metric("Enrolled Courses", summary["enrolled"])
     with col2:
-        st.metric("Available Courses", len(all_courses))
+        st.metric("Available Courses", summary["courses"])
     with col3:
-        st.metric("Study Materials", sum(user_courses['materials_count']))
+        st.metric("Study Materials", summary["materials"])
     with col4:
         st.metric("Days Remaining", "730")
     
@@ -427,19 +2289,11 @@ def show_home_dashboard():
     
     # Enrolled Courses
     st.subheader("📚 My Enrolled Courses")
+    user_courses = get_user_courses_page(user_id, limit=DASHBOARD_COURSES)
     if not user_courses.empty:
-        for _, course in user_courses.iterrows():
-            with st.container():
-                st.markdown(f"""
-                <div class="course-card">
-                    <h3>{course['name']}</h3>
-                    <p>{course['description']}</p>
-                    <div style="display: flex; justify-content: space-between; align-items: center;">
-                        <span>📖 {course['materials_count']} Study Materials</span>
-                        <span>🕐 Batch starts: {course['batch_date']}</span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+        render_cards([enrolled_course_card(course) for course in user_courses.to_dict("records")])
+        if summary["enrolled"] > DASHBOARD_COURSES:
+            st.caption(f"Showing {DASHBOARD_COURSES} of {summary['enrolled']} courses — see 🕐 My Batches for the rest.")
     else:
         st.info("You haven't enrolled in any courses yet. Visit 'My Courses' to enroll!")
     
@@ -461,43 +2315,92 @@ def show_home_dashboard():
             st.session_state.current_page = "Study Materials"
             st.rerun()
 
+@traced("page")
 def show_pdf_quiz_maker():
     st.markdown('<div class="main-header">📝 PDF to Quiz Converter</div>', unsafe_allow_html=True)
     
     # File upload
     uploaded_file = st.file_uploader("📁 Upload PDF File", type="pdf")
     
+    # Optional course link so the attempt counts towards that course's progress
+    user_courses = get_user_courses(st.session_state.user_id)
+    course_names = {None: "No course", **dict(zip(user_courses['id'].tolist(), user_courses['name']))}
+    quiz_course = st.selectbox("📚 Practice for course", list(course_names), format_func=course_names.get)
+    client_player = st.toggle("⚡ Fast mode: run the quiz in your browser", value=True,
+                              help="Answers, navigation and the timer stay in the browser; "
+                                   "only the finished answer sheet is sent back")
+    
     if uploaded_file:
         if st.button("🚀 Convert to Quiz", type="primary"):
-            with st.spinner("🔄 Converting PDF to quiz..."):
-                text = extract_text_from_pdf(uploaded_file)
-                questions = fast_parse_pdf_content(text)
-                
-                if questions:
-                    st.session_state.quiz_data = {
-                        'questions': questions,
-                        'user_answers': {},
-                        'current_q': 0,
-                        'quiz_started': True,
-                        'start_time': time.time(),
-                        'question_start_time': time.time(),
-                        'quiz_completed': False,
-                        'marked_review': set(),
-                        'show_ai_explanation': {}
-                    }
-                    st.success(f"✅ {len(questions)} questions generated!")
-                else:
-                    st.error("❌ No questions found in PDF")
+            quiz_data = new_quiz_session(
+                course_id=quiz_course,
+                player='client' if client_player else 'server',
+                runs_at_start=st.session_state.script_runs,
+                loading=True,
+                pages_done=0,
+                page_errors=[],
+                load_error=None
+            )
+            # A new upload replaces the old quiz; don't keep converting a PDF nobody will see
+            if st.session_state.quiz_data.get('loading'):
+                cancel_conversion_job(st.session_state.quiz_data.get('job_id'))
+            if submit_conversion_job(uploaded_file, quiz_data):
+                st.session_state.quiz_data = quiz_data
+            else:
+                st.error(f"🚦 The converter is busy with {CONVERSION_QUEUE_LIMIT} queued papers. "
+                         "Please try again in a minute.")
+        
+        cache = pdf_cache_summary()
+        st.caption(f"🗄️ Text cache: {cache['hits']} hits / {cache['misses']} misses · "
+                   f"{cache['entries']} papers ({cache['size_bytes'] / 1024 / 1024:.1f} MB)")
+    
+    # Question bank search across every uploaded paper
+    bank = question_bank_stats()
+    with st.expander(f"🔎 Search question bank ({bank['questions']} questions from {bank['papers']} papers)"):
+        search_text = st.text_input("Search questions", placeholder="e.g. synonym of abundant")
+        if search_text:
+            results = search_question_bank(search_text)
+            if results:
+                for result in results:
+                    st.markdown(f"**{result['question']}**  \n"
+                                f"✅ {result['correct_answer']}) {result['options'].get(result['correct_answer'], '')}"
+                                f" · appears in {result['papers']} paper(s)")
+                if st.button(f"📝 Practice these {len(results)} questions"):
+                    quiz_data = new_quiz_session(
+                        course_id=quiz_course,
+                        player='client' if client_player else 'server',
+                        runs_at_start=st.session_state.script_runs
+                    )
+                    add_quiz_questions(quiz_data, [result['bank_id'] for result in results])
+                    st.session_state.quiz_data = quiz_data
+            else:
+                st.info("No matching questions yet.")
     
-    # Quiz Interface
-    if st.session_state.quiz_data.get('questions'):
+    # Quiz Interface; while the first page is still converting, the job's progress instead
+    if st.session_state.quiz_data.get('question_ids'):
         render_quiz_interface()
+    elif st.session_state.quiz_data.get('job_id'):
+        show_conversion_job()
 
 def render_quiz_interface():
     quiz_data = st.session_state.quiz_data
-    questions = quiz_data['questions']
+    total = quiz_length(quiz_data)
     current_q = quiz_data['current_q']
     
+    if quiz_data.get('player') == 'client':
+        # What this run hands the browser player; the loading fragment reruns the page once more arrive
+        quiz_data['rendered_questions'] = total
+        quiz_data['rendered_at'] = time.time()
+    
+    if quiz_data.get('loading') is not None:
+        show_quiz_loading_status()
+    
+    if quiz_data.get('player') == 'client':
+        render_client_quiz(quiz_data)
+        return
+    
+    play_pending_sound()
+    
     # Timer
     if quiz_data['quiz_started'] and not quiz_data['quiz_completed']:
         elapsed_time = time.time() - quiz_data['start_time']
@@ -516,11 +2419,11 @@ def render_quiz_interface():
     # Quick Navigation Grid
     st.subheader("🎯 Quick Navigation")
     cols = st.columns(10)
-    for idx in range(min(10, len(questions))):
+    for idx in range(min(10, total)):
         with cols[idx]:
-            is_answered = idx in quiz_data['user_answers']
+            is_answered = quiz_answer(quiz_data, idx) is not None
             is_current = idx == current_q
-            is_marked = idx in quiz_data['marked_review']
+            is_marked = quiz_data['marked'][idx]
             
             btn_text = f"Q{idx+1}"
             if is_marked:
@@ -528,18 +2431,18 @@ def render_quiz_interface():
             
             btn_type = "primary" if is_current else "secondary"
             if st.button(btn_text, key=f"nav_{idx}", use_container_width=True, type=btn_type):
+                track_question_time(quiz_data)
                 quiz_data['current_q'] = idx
-                quiz_data['question_start_time'] = time.time()
                 st.rerun()
     
     # Current Question
     if not quiz_data['quiz_completed']:
-        question = questions[current_q]
-        user_answer = quiz_data['user_answers'].get(current_q)
+        question = quiz_question(quiz_data, current_q)
+        user_answer = quiz_answer(quiz_data, current_q)
         
         st.markdown(f"""
         <div style="background: linear-gradient(135deg, #667eea 0%, #764ba2 100%); padding: 2rem; border-radius: 15px; margin: 1rem 0; color: white;">
-            <h3>Question {current_q + 1} of {len(questions)}</h3>
+            <h3>Question {current_q + 1} of {total}</h3>
             <div style="font-size: 1.2rem; font-weight: 600;">{question['question']}</div>
         </div>
         """, unsafe_allow_html=True)
@@ -553,7 +2456,8 @@ def render_quiz_interface():
                 use_container_width=True,
                 type="primary" if is_selected else "secondary"
             ):
-                quiz_data['user_answers'][current_q] = opt_letter
+                quiz_data['answers'][current_q] = ord(opt_letter)
+                quiz_data['attempts'][current_q] += 1
                 if opt_letter == question['correct_answer']:
                     autoplay_audio("correct")
                 else:
@@ -564,42 +2468,172 @@ def render_quiz_interface():
         col1, col2, col3 = st.columns(3)
         with col1:
             if st.button("⏮️ Previous", disabled=current_q == 0):
+                track_question_time(quiz_data)
                 quiz_data['current_q'] = max(0, current_q - 1)
-                quiz_data['question_start_time'] = time.time()
                 st.rerun()
         with col2:
             if st.button("📌 Mark", type="secondary"):
-                if current_q in quiz_data['marked_review']:
-                    quiz_data['marked_review'].remove(current_q)
-                else:
-                    quiz_data['marked_review'].add(current_q)
+                quiz_data['marked'][current_q] ^= 1
                 st.rerun()
         with col3:
-            if current_q < len(questions) - 1:
+            if current_q == total - 1 and quiz_data.get('loading'):
+                st.button("⏳ Loading more...", disabled=True)
+            elif current_q < total - 1:
                 if st.button("Next ▶", type="primary"):
+                    track_question_time(quiz_data)
                     quiz_data['current_q'] += 1
-                    quiz_data['question_start_time'] = time.time()
                     st.rerun()
             else:
                 if st.button("Finish 🏁", type="primary"):
+                    track_question_time(quiz_data)
                     quiz_data['quiz_completed'] = True
+                    quiz_data['end_time'] = time.time()
                     st.rerun()
     
     else:
         # Results
         show_quiz_results()
 
+def sheet_number(value, high):
+    """A number from the browser's answer sheet clamped to [0, high]; anything else counts as 0"""
+    if isinstance(value, bool) or not isinstance(value, (int, float)) or value != value:
+        return 0
+    return min(max(value, 0), high)
+
+def apply_answer_sheet(quiz_data, questions, sheet):
+    """Copy the browser's answer sheet into the session, keeping only entries that fit this quiz"""
+    total = len(questions)
+    elapsed = time.time() - quiz_data['start_time']
+    answers, marked = sheet.get('answers'), sheet.get('marked')
+    time_spent, attempts_made = sheet.get('time_spent'), sheet.get('attempts')
+    for idx, letter in (answers.items() if isinstance(answers, dict) else ()):
+        idx = int(idx) if str(idx).isdecimal() else -1
+        if 0 <= idx < total and isinstance(letter, str) and letter in questions[idx]['options']:
+            quiz_data['answers'][idx] = ord(letter)
+    for idx in (marked if isinstance(marked, list) else ()):
+        if isinstance(idx, int) and not isinstance(idx, bool) and 0 <= idx < total:
+            quiz_data['marked'][idx] = 1
+    if not isinstance(time_spent, list) or not isinstance(attempts_made, list):
+        return
+    for idx, seconds, attempts in zip(range(total), time_spent, attempts_made):
+        quiz_data['time_spent'][idx] = sheet_number(seconds, elapsed)
+        quiz_data['attempts'][idx] = int(sheet_number(attempts, 65535))  # array('H') range
+
+def render_client_quiz(quiz_data):
+    """Ship the question set to the browser once and score the answer sheet it sends back"""
+    if not quiz_data['quiz_completed']:
+        questions = quiz_questions(quiz_data)
+        sheet = quiz_player(
+            questions=[{"question": q['question'], "options": q['options'], "correct_answer": q['correct_answer']}
+                       for q in questions],
+            elapsed=time.time() - quiz_data['start_time'],
+            loading=bool(quiz_data.get('loading')),
+            sounds={kind: f"sounds/{filename}" for kind, filename in FEEDBACK_SOUNDS.items()},
+            sound_enabled=st.session_state.sound_enabled,
+            key=f"quiz_player_{quiz_data['start_time']}",
+            default=None
+        )
+        if not sheet or not isinstance(sheet, dict):
+            return
+        apply_answer_sheet(quiz_data, questions, sheet)
+        quiz_data['end_time'] = time.time()  # server clock, like start_time
+        quiz_data['quiz_completed'] = True
+    
+    show_quiz_results()
+
+def track_question_time(quiz_data):
+    """Add the time spent on the current question before moving away from it"""
+    now = time.time()
+    quiz_data['time_spent'][quiz_data['current_q']] += now - quiz_data['question_start_time']
+    quiz_data['question_start_time'] = now
+
+def conversion_progress(job):
+    """Progress bar of pages converted so far"""
+    total = job['pages_total']
+    if total:
+        st.progress(min(job['pages_done'] / total, 1.0),
+                    text=f"📄 {job['pages_done']} / {total} pages · {job['questions']} questions ready")
+
+def show_conversion_job():
+    """Queue position and page progress until the first questions arrive, with a cancel button"""
+    quiz_data = st.session_state.quiz_data
+    
+    @st.fragment(run_every=1 if quiz_data['loading'] else None)
+    def job_status():
+        if quiz_length(quiz_data):
+            st.rerun()  # first questions are in: rerun the page to start the quiz
+        job = conversion_job_status(quiz_data['job_id'])
+        
+        if quiz_data['loading'] and job:
+            if job['status'] == 'queued':
+                st.info(f"🚦 Waiting for a free converter: {job['position'] - 1} paper(s) ahead of yours "
+                        f"({job['running']} converting now)")
+            else:
+                st.info("🔄 Converting PDF to quiz...")
+                conversion_progress(job)
+            if st.button("✖️ Cancel conversion", key=f"cancel_{quiz_data['job_id']}"):
+                cancel_conversion_job(quiz_data['job_id'])
+                st.rerun()
+        elif job and job['status'] == 'cancelled':
+            st.warning("✖️ Conversion cancelled")
+        elif quiz_data['load_error']:
+            st.error(f"❌ Error processing PDF: {quiz_data['load_error']}")
+        else:
+            st.error("❌ No questions found in PDF")
+        for page_no, error in quiz_data['page_errors']:
+            st.warning(f"⚠️ Page {page_no} skipped: {error}")
+    
+    job_status()
+
+def show_quiz_loading_status():
+    """Live question count while the rest of the PDF is still being extracted"""
+    quiz_data = st.session_state.quiz_data
+    
+    @st.fragment(run_every=1 if quiz_data['loading'] else None)
+    def loading_status():
+        job = conversion_job_status(quiz_data['job_id']) if quiz_data.get('job_id') else None
+        if quiz_data['loading']:
+            st.info(f"⏳ Reading PDF... {quiz_length(quiz_data)} questions ready "
+                    f"({quiz_data['pages_done']} pages processed)")
+            if job:
+                conversion_progress(job)
+                if st.button("⏹️ Stop loading more questions", key=f"stop_{quiz_data['job_id']}"):
+                    cancel_conversion_job(quiz_data['job_id'])
+        elif not quiz_data.get('load_announced'):
+            # Loading just finished: rerun the whole page so counts and the Finish button update
+            quiz_data['load_announced'] = True
+            st.rerun()
+        if (quiz_data['loading'] and quiz_data.get('player') == 'client' and not quiz_data['quiz_completed']
+                and quiz_length(quiz_data) > quiz_data.get('rendered_questions', 0)
+                and time.time() - quiz_data.get('rendered_at', 0) >= CLIENT_QUIZ_REFRESH):
+            # The browser player only sees questions passed on a full run; it appends them in place
+            st.rerun()
+        for page_no, error in quiz_data['page_errors']:
+            st.warning(f"⚠️ Page {page_no} skipped: {error}")
+        if quiz_data['load_error']:
+            st.error(f"❌ Stopped reading PDF: {quiz_data['load_error']}")
+    
+    loading_status()
+
 def show_quiz_results():
     quiz_data = st.session_state.quiz_data
-    questions = quiz_data['questions']
+    questions = quiz_questions(quiz_data)
     
     correct_count = 0
     for idx, q in enumerate(questions):
-        if quiz_data['user_answers'].get(idx) == q['correct_answer']:
+        if quiz_answer(quiz_data, idx) == q['correct_answer']:
             correct_count += 1
     
     score_percent = (correct_count / len(questions)) * 100
-    total_time = time.time() - quiz_data['start_time']
+    total_time = quiz_data.get('end_time', time.time()) - quiz_data['start_time']
+    
+    # Results page reruns on every interaction; queue the attempt only once
+    if not quiz_data.get('result_saved'):
+        if submit_quiz_result(st.session_state.user_id, quiz_data, total_time, quiz_data.get('course_id')) is None:
+            st.error("⚠️ The server is busy and this attempt hasn't been saved yet.")
+            st.button("🔁 Retry saving", key="retry_quiz_save")
+        else:
+            quiz_data['result_saved'] = True
     
     st.balloons()
     st.markdown(f"""
@@ -611,110 +2645,130 @@ def show_quiz_results():
     </div>
     """, unsafe_allow_html=True)
     
+    if 'runs_at_start' in quiz_data:
+        # Frozen the first time results render; reruns on the results page don't count
+        reruns = quiz_data.setdefault('quiz_reruns', st.session_state.script_runs - quiz_data['runs_at_start'])
+        st.caption(f"🔁 Server reruns during this quiz: {reruns}")
+    
     if st.button("🔄 Take Another Quiz", use_container_width=True):
+        if quiz_data.get('loading'):
+            cancel_conversion_job(quiz_data.get('job_id'))
         st.session_state.quiz_data = {}
         st.rerun()
 
+@traced("page")
 def show_my_courses():
     st.markdown('<div class="main-header">📚 Available Courses</div>', unsafe_allow_html=True)
     
-    courses_df = get_all_courses()
-    user_courses = get_user_courses(st.session_state.user_id)
-    enrolled_course_ids = user_courses['id'].tolist()
+    user_id = st.session_state.user_id
+    col1, col2 = st.columns([2, 1])
+    with col1:
+        search = st.text_input("🔍 Search courses", key="catalog_search").strip()
+    with col2:
+        show = st.radio("Show", ["All", "Not enrolled", "Enrolled"], horizontal=True, key="catalog_filter")
+    enrolled = {"All": None, "Not enrolled": False, "Enrolled": True}[show]
     
-    for _, course in courses_df.iterrows():
-        is_enrolled = course['id'] in enrolled_course_ids
-        
-        with st.container():
-            col1, col2 = st.columns([3, 1])
-            
-            with col1:
-                st.markdown(f"""
-                <div class="course-card">
-                    <h3>{course['name']}</h3>
-                    <p>{course['description']}</p>
-                    <div style="display: flex; gap: 2rem; margin-top: 1rem;">
-                        <span>📖 {course['materials_count']} Materials</span>
-                        <span>👥 {course['students_count']} Students</span>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
-            
-            with col2:
-                if is_enrolled:
-                    st.success("✅ Enrolled")
-                    if st.button("📖 Study", key=f"study_{course['id']}"):
-                        st.session_state.selected_course = course['id']
-                        st.session_state.current_page = "Study Materials"
-                        st.rerun()
-                else:
-                    if st.button("🎯 Enroll Now", key=f"enroll_{course['id']}", type="primary"):
-                        enroll_user_in_course(st.session_state.user_id, course['id'])
-                        st.success("✅ Successfully enrolled!")
-                        st.rerun()
+    page, has_next = keyset_page(
+        "catalog", functools.partial(get_catalog_page, user_id, search, enrolled), (search, enrolled))
+    
+    if page.empty:
+        st.info("No courses match your search.")
+        return
+    
+    render_cards([catalog_course_card(course) for course in page.to_dict("records")])
+    
+    # Keyed by id: courses can share a title
+    courses = {course['id']: course for course in page.to_dict("records")}
+    col1, col2, col3 = st.columns([2, 1, 1])
+    with col1:
+        chosen = courses[st.selectbox("Course", list(courses), format_func=lambda course_id: courses[course_id]['name'],
+                                      key="catalog_course")]
+    with col2:
+        if st.button("🎯 Enroll Now", type="primary", disabled=bool(chosen['enrolled']), use_container_width=True):
+            enroll_user_in_course(user_id, chosen['id'])
+            st.success("✅ Successfully enrolled!")
+            st.rerun()
+    with col3:
+        if st.button("📖 Study", disabled=not chosen['enrolled'], use_container_width=True):
+            st.session_state.selected_course = chosen['id']
+            st.session_state.current_page = "Study Materials"
+            st.rerun()
+    
+    pager_controls("catalog", page, has_next)
 
+@traced("page")
 def show_my_batches():
     st.markdown('<div class="main-header">🕐 My Batches</div>', unsafe_allow_html=True)
     
-    user_courses = get_user_courses(st.session_state.user_id)
+    user_id = st.session_state.user_id
+    search = st.text_input("🔍 Search batches", key="batches_search").strip()
+    page, has_next = keyset_page("batches", functools.partial(get_user_courses_page, user_id, search), (search,))
     
-    if not user_courses.empty:
-        for _, batch in user_courses.iterrows():
-            with st.container():
-                st.markdown(f"""
-                <div class="course-card">
-                    <h3>🎯 {batch['name']}</h3>
-                    <div style="display: grid; grid-template-columns: 1fr 1fr 1fr; gap: 1rem; margin-top: 1rem;">
-                        <div>
-                            <strong>Start Date</strong><br>
-                            📅 {batch['batch_date']}
-                        </div>
-                        <div>
-                            <strong>Validity</strong><br>
-                            ⏳ {batch['validity_days']} days
-                        </div>
-                        <div>
-                            <strong>Materials</strong><br>
-                            📚 {batch['materials_count']} files
-                        </div>
-                    </div>
-                </div>
-                """, unsafe_allow_html=True)
+    if not page.empty:
+        render_cards([batch_card(batch) for batch in page.to_dict("records")])
+        pager_controls("batches", page, has_next)
+    elif search:
+        st.info("No batches match your search.")
     else:
         st.info("No active batches. Enroll in a course to get started!")
 
+@traced("page")
 def show_study_materials():
     st.markdown('<div class="main-header">📥 Study Materials</div>', unsafe_allow_html=True)
     
     user_courses = get_user_courses(st.session_state.user_id)
     
     if not user_courses.empty:
-        selected_course = st.selectbox("Select Course", user_courses['name'].tolist())
+        course_names = dict(zip(user_courses['id'].tolist(), user_courses['name']))
+        course_ids = list(course_names)
+        selected = st.session_state.get('selected_course')
+        index = course_ids.index(selected) if selected in course_ids else 0
+        course_id = st.selectbox("Select Course", course_ids, index=index, format_func=course_names.get)
+        selected_course = course_names[course_id]
+        st.session_state.selected_course = course_id
+        search = st.text_input("🔍 Search materials", key="materials_search").strip()
+        page, has_next = keyset_page(
+            "materials", functools.partial(get_study_materials_page, course_id, search), (course_id, search))
         
-        course_id = user_courses[user_courses['name'] == selected_course]['id'].iloc[0]
-        materials = get_study_materials(course_id)
-        
-        if not materials.empty:
+        if not page.empty:
             st.subheader(f"Study Materials for {selected_course}")
             
-            for _, material in materials.iterrows():
-                col1, col2, col3 = st.columns([3, 1, 1])
-                
-                with col1:
-                    st.write(f"**{material['name']}**")
-                    st.write(f"Uploaded: {material['upload_date']}")
-                
-                with col2:
-                    st.write(f"📄 {material['file_type']}")
-                
-                with col3:
-                    if st.button("📥 Download", key=f"dl_{material['id']}"):
-                        st.success(f"Downloading {material['name']}")
+            render_cards(['<table style="width: 100%;"><tr><th>Material</th><th>Uploaded</th><th>Type</th><th>Size</th></tr>']
+                         + [material_row(material) for material in page.to_dict("records")] + ['</table>'])
+            
+            # Keyed by id: the same file name can be uploaded more than once
+            materials = {material['id']: material for material in page.to_dict("records")}
+            col1, col2 = st.columns([3, 1])
+            with col1:
+                chosen = materials[st.selectbox(
+                    "Material", list(materials), key="material_choice",
+                    format_func=lambda material_id: f"{materials[material_id]['name']} ({materials[material_id]['upload_date']})")]
+            with col2:
+                # The file is only opened when the button is clicked, never on a rerun
+                st.download_button("📥 Download", data=functools.partial(open_blob, chosen['sha256']),
+                                   file_name=chosen['name'], mime=chosen['mime_type'], on_click="ignore",
+                                   disabled=not chosen['sha256'], use_container_width=True)
+            if not chosen['sha256']:
+                st.caption("This material has no file attached yet.")
+            
+            pager_controls("materials", page, has_next)
+        elif search:
+            st.info("No study materials match your search.")
         else:
             st.info("No study materials available for this course yet.")
+        
+        with st.expander("📤 Upload material"):
+            # A fresh key after each upload clears the uploader, so the same file isn't added twice
+            uploads = st.session_state.setdefault("material_uploads", 0)
+            upload = st.file_uploader("Add a file to this course", key=f"material_upload_{uploads}")
+            if upload is not None and st.button("Add to course"):
+                add_study_material(course_id, upload)
+                st.session_state.material_uploads += 1
+                st.rerun()
     else:
         st.info("Enroll in a course to access study materials!")
 
+@traced("page")
 def show_progress_report():
     st.markdown('<div class="main-header">📊 Progress Report</div>', unsafe_allow_html=True)
     
@@ -723,37 +2777,120 @@ def show_progress_report():
     if not user_courses.empty:
         st.subheader("Course Progress")
         
+        course_progress = get_course_progress(st.session_state.user_id)
         for _, course in user_courses.iterrows():
-            progress = random.randint(20, 95)  # Simulated progress
+            stats = course_progress.get(course['id'])
+            progress = int(stats['percent']) if stats else 0
             st.write(f"**{course['name']}**")
             st.progress(progress)
-            st.write(f"Progress: {progress}%")
+            if stats:
+                st.write(f"Progress: {progress}% correct across {stats['quizzes_taken']} quizzes")
+            else:
+                st.write("Progress: no quizzes taken for this course yet")
             st.markdown("---")
         
+        summary = get_progress_summary(st.session_state.user_id) or {
+            "quizzes_taken": 0, "average_percent": 0, "best_percent": 0,
+            "total_hours": 0, "daily_average_hours": 0, "current_streak": 0}
+        
         # Quiz Performance
         st.subheader("Quiz Performance")
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Quizzes Taken", "12")
+            st.metric("Quizzes Taken", summary["quizzes_taken"])
         with col2:
-            st.metric("Average Score", "78%")
+            st.metric("Average Score", f"{summary['average_percent']:.0f}%")
         with col3:
-            st.metric("Best Score", "95%")
+            st.metric("Best Score", f"{summary['best_percent']:.0f}%")
         
         # Study Time
         st.subheader("Study Time")
         col1, col2, col3 = st.columns(3)
         
         with col1:
-            st.metric("Total Hours", "45")
+            st.metric("Total Hours", f"{summary['total_hours']:.1f}")
         with col2:
-            st.metric("Daily Average", "1.5h")
+            st.metric("Daily Average", f"{summary['daily_average_hours']:.1f}h")
         with col3:
-            st.metric("Current Streak", "7 days")
+            st.metric("Current Streak", f"{summary['current_streak']} days")
     
     else:
         st.info("Start learning to see your progress!")
+    
+    with st.expander("📤 Export cohort results"):
+        courses = get_all_courses()
+        course_names = {None: "All courses", **dict(zip(courses['id'].tolist(), courses['name']))}
+        col1, col2, col3 = st.columns(3)
+        with col1:
+            report = st.selectbox("Report", list(COHORT_REPORTS), key="export_report")
+        with col2:
+            course_id = st.selectbox("Course", list(course_names), format_func=course_names.get, key="export_course")
+        with col3:
+            file_label = st.radio("Format", list(EXPORT_FORMATS), horizontal=True, key="export_format")
+        file_format = EXPORT_FORMATS[file_label]
+        # Built only when clicked, straight from the database cursor into the file
+        st.download_button("📥 Download report",
+                           data=functools.partial(export_report, report, file_format, course_id),
+                           file_name=f"selectionway-{report.lower().replace(' ', '-')}.{file_format}",
+                           on_click="ignore", use_container_width=True)
+
+# ==================== COMMAND LINE ====================
+def run_cli(argv):
+    """Maintenance commands, run as `python app.py <command>` outside Streamlit"""
+    parser = argparse.ArgumentParser(prog="app.py", description="SelectionWay maintenance commands")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("rebuild-rollups", help="recompute progress rollups from quiz_results")
+    import_parser = commands.add_parser("import-students", help="bulk-add students and enrollments from .xlsx/.csv")
+    import_parser.add_argument("file", help="header row with name, email and optionally phone, course_id, "
+                                            "batch_date, validity_days")
+    import_parser.add_argument("--batch", type=int, default=IMPORT_BATCH, help="rows per transaction")
+    convert_parser = commands.add_parser("convert", help="convert every new PDF under a directory into the question bank")
+    convert_parser.add_argument("directory")
+    convert_parser.add_argument("--processes", type=int, default=PDF_WORKERS, help="papers converted in parallel")
+    convert_parser.add_argument("--batch", type=int, default=CONVERT_BATCH, help="papers per transaction")
+    convert_parser.add_argument("--retry-errors", action="store_true",
+                                help="convert again papers that had unreadable pages last time")
+    args = parser.parse_args(argv)
+    
+    if args.command == "rebuild-rollups":
+        start = time.perf_counter()
+        with db_write() as conn:
+            rebuild_progress_rollups(conn.cursor())
+            users = conn.execute("SELECT COUNT(*) FROM user_quiz_stats").fetchone()[0]
+        print(f"Rebuilt progress rollups for {users} users in {time.perf_counter() - start:.2f}s")
+    
+    elif args.command == "import-students":
+        try:
+            stats = import_students(args.file, args.batch,
+                                    progress=lambda running: print(f"  {running['rows']} rows read", file=sys.stderr))
+        except (OSError, ValueError) as e:
+            parser.error(f"{args.file}: {e}")
+        for row_number, reason in stats["rejects"]:
+            print(f"Row {row_number} rejected: {reason}")
+        if stats["rejected"] > len(stats["rejects"]):
+            print(f"... and {stats['rejected'] - len(stats['rejects'])} more rejected rows")
+        print(f"Imported {stats['rows'] - stats['rejected']} of {stats['rows']} rows in {stats['seconds']:.2f}s "
+              f"({stats['rows_per_second']:.0f} rows/s): {stats['users_added']} new students, "
+              f"{stats['enrollments_added']} new enrollments, {stats['rejected']} rejected")
+    
+    elif args.command == "convert":
+        if not os.path.isdir(args.directory):
+            parser.error(f"{args.directory}: not a directory")
+        stats = run_batch_conversion(args.directory, args.processes, args.batch, args.retry_errors)
+        seconds = stats["seconds"] or 1e-9
+        print(f"{stats['found']} papers found: {stats['converted']} converted, {stats['skipped']} already done, "
+              f"{stats['failed']} failed")
+        print(f"{stats['pages']} pages and {stats['questions']} questions in {stats['seconds']:.1f}s "
+              f"({stats['converted'] / seconds:.2f} papers/s, {stats['pages'] / seconds:.1f} pages/s)")
+        if stats["interrupted"]:
+            print("Interrupted: finished papers were saved; run the same command again to continue")
+            sys.exit(130)
 
 if __name__ == "__main__":
-    main()
+    # `streamlit run app.py` also executes this block; only plain `python app.py` gets the CLI
+    if runtime.exists():
+        with trace_span("script.run"):
+            main()
+    else:
+        run_cli(sys.argv[1:])
@@ -0,0 +1,125 @@
+"""Concurrency load test: many simulated Streamlit sessions hitting the SQLite helpers
+
+Each session thread performs dashboard "reruns" (user courses, catalog, materials) and
+occasionally enrolls in a course. The legacy variant opens a connection per helper call
+on a rollback-journal database; the pooled variant uses the app's connection pool (WAL).
+
+    python benchmarks/bench_db_concurrency.py --sessions 50 --reruns 40
+"""
+import argparse
+import os
+import random
+import sqlite3
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime
+
+import pandas as pd
+
+WORKDIR = tempfile.mkdtemp(prefix="selectionway-bench-")
+os.environ["SELECTIONWAY_DB"] = os.path.join(WORKDIR, "pooled.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+LEGACY_DB = os.path.join(WORKDIR, "legacy.db")
+USER_COURSES = """SELECT c.id, c.name, c.description, c.materials_count, e.batch_date, e.validity_days
+                  FROM courses c JOIN enrollments e ON c.id = e.course_id WHERE e.user_id = ?"""
+
+
+def seed(conn, users, courses):
+    conn.executemany("INSERT OR IGNORE INTO users VALUES (?, ?, ?, ?)",
+                     [(u, f"Student {u}", f"s{u}@example.com", "") for u in range(1, users + 1)])
+    conn.executemany("INSERT OR IGNORE INTO courses VALUES (?, ?, ?, ?, ?)",
+                     [(c, f"Course {c}", "Synthetic course", 10, 0) for c in range(1, courses + 1)])
+    conn.executemany("INSERT OR IGNORE INTO study_materials (id, course_id, name, file_type, upload_date) "
+                     "VALUES (?, ?, ?, ?, ?)",
+                     [(c * 10 + m, c, f"Notes {m}.pdf", "PDF", "2024-09-20")
+                      for c in range(1, courses + 1) for m in range(5)])
+
+
+def legacy_rerun(user_id, course_id, enroll):
+    """The helpers as they were: one connection per call, rollback journal"""
+    for query, params in ((USER_COURSES, (user_id,)), ("SELECT * FROM courses", ()),
+                          ("SELECT * FROM study_materials WHERE course_id = ?", (course_id,))):
+        conn = sqlite3.connect(LEGACY_DB, check_same_thread=False)
+        pd.read_sql_query(query, conn, params=params)
+        conn.close()
+    if enroll:
+        conn = sqlite3.connect(LEGACY_DB, check_same_thread=False)
+        c = conn.cursor()
+        c.execute("SELECT * FROM enrollments WHERE user_id = ? AND course_id = ?", (user_id, course_id))
+        if not c.fetchone():
+            c.execute("INSERT INTO enrollments VALUES (?, ?, ?, ?, ?)",
+                      (user_id, course_id, datetime.now().strftime("%Y-%m-%d"), "2024-10-03", 730))
+            conn.commit()
+        conn.close()
+
+
+def pooled_rerun(user_id, course_id, enroll):
+    app.get_user_courses(user_id)
+    app.get_all_courses()
+    app.get_study_materials(course_id)
+    if enroll:
+        app.enroll_user_in_course(user_id, course_id)
+
+
+def run_load(rerun, sessions, reruns, courses, write_ratio):
+    latencies, errors = [], []
+    lock = threading.Lock()
+
+    def session(user_id):
+        rng = random.Random(user_id)
+        for _ in range(reruns):
+            start = time.perf_counter()
+            try:
+                rerun(user_id, rng.randint(1, courses), rng.random() < write_ratio)
+            except sqlite3.OperationalError as e:
+                with lock:
+                    errors.append(str(e))
+            with lock:
+                latencies.append(time.perf_counter() - start)
+
+    threads = [threading.Thread(target=session, args=(user_id,)) for user_id in range(1, sessions + 1)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    elapsed = time.perf_counter() - start
+    latencies.sort()
+    return len(latencies) / elapsed, latencies[int(len(latencies) * 0.95)] * 1000, len(errors)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sessions", type=int, default=50)
+    parser.add_argument("--reruns", type=int, default=40)
+    parser.add_argument("--courses", type=int, default=200)
+    parser.add_argument("--write-ratio", type=float, default=0.05)
+    args = parser.parse_args()
+
+    legacy = sqlite3.connect(LEGACY_DB)
+    legacy.execute("CREATE TABLE users (id INTEGER PRIMARY KEY, name TEXT, email TEXT, phone TEXT)")
+    legacy.execute("CREATE TABLE courses (id INTEGER PRIMARY KEY, name TEXT, description TEXT, "
+                   "materials_count INTEGER, students_count INTEGER)")
+    legacy.execute("CREATE TABLE enrollments (user_id INTEGER, course_id INTEGER, enroll_date TEXT, "
+                   "batch_date TEXT, validity_days INTEGER)")
+    legacy.execute("CREATE TABLE study_materials (id INTEGER PRIMARY KEY, course_id INTEGER, name TEXT, "
+                   "file_type TEXT, upload_date TEXT)")
+    seed(legacy, args.sessions, args.courses)
+    legacy.commit()
+    legacy.close()
+    with app.db_write() as conn:
+        seed(conn, args.sessions, args.courses)
+
+    print(f"{args.sessions} sessions x {args.reruns} reruns, {args.write_ratio:.0%} with an enrollment write")
+    print(f"{'variant':<10}{'reruns/s':>10}{'p95 ms':>10}{'lock errors':>13}")
+    for name, rerun in (("legacy", legacy_rerun), ("pooled", pooled_rerun)):
+        throughput, p95, errors = run_load(rerun, args.sessions, args.reruns, args.courses, args.write_ratio)
+        print(f"{name:<10}{throughput:>10.0f}{p95:>10.1f}{errors:>13}")
+
+
+if __name__ == "__main__":
+    main()
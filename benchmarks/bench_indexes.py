@@ -0,0 +1,75 @@
+"""Query plans and timings for the catalog helpers on a large synthetic database
+
+Builds a database at migration 2 (no keys), times get_user_courses / get_study_materials,
+applies the remaining migrations and times them again, printing EXPLAIN QUERY PLAN for each.
+
+    python benchmarks/bench_indexes.py --enrollments 1000000 --materials 100000
+"""
+import argparse
+import os
+import random
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="selectionway-bench-")
+os.environ["SELECTIONWAY_DB"] = os.path.join(WORKDIR, "indexes.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+USER_COURSES = """SELECT c.id, c.name, c.description, c.materials_count, e.batch_date, e.validity_days
+                  FROM courses c JOIN enrollments e ON c.id = e.course_id WHERE e.user_id = ?"""
+MATERIALS = "SELECT * FROM study_materials WHERE course_id = ?"
+
+
+def build(db_path, users, courses, enrollments, materials):
+    """Fresh database at schema version 2 filled with synthetic rows"""
+    app.migrate_db(db_path, app.MIGRATIONS[:2])
+    rng = random.Random(0)
+    with app.db_write(db_path) as conn:
+        conn.executemany("INSERT OR IGNORE INTO courses VALUES (?, ?, ?, ?, ?)",
+                         ((c, f"Course {c}", "Synthetic", 10, 0) for c in range(1, courses + 1)))
+        pairs = set()
+        while len(pairs) < enrollments:
+            pairs.add((rng.randint(1, users), rng.randint(1, courses)))
+        conn.executemany("INSERT INTO enrollments VALUES (?, ?, '2024-09-20', '2024-10-03', 730)", pairs)
+        conn.executemany("INSERT INTO study_materials VALUES (?, ?, ?, 'PDF', '2024-09-20')",
+                         ((m, rng.randint(1, courses), f"Notes {m}.pdf") for m in range(100, materials + 100)))
+
+
+def report(label, db_path, users, courses, lookups):
+    rng = random.Random(1)
+    with app.db_connection(db_path) as conn:
+        for name, query in (("get_user_courses", USER_COURSES), ("get_study_materials", MATERIALS)):
+            plan = " | ".join(row[3] for row in conn.execute("EXPLAIN QUERY PLAN " + query, (1,)))
+            upper = users if name == "get_user_courses" else courses
+            start = time.perf_counter()
+            for _ in range(lookups):
+                conn.execute(query, (rng.randint(1, upper),)).fetchall()
+            per_call = (time.perf_counter() - start) / lookups * 1000
+            print(f"{label:<8}{name:<22}{per_call:>10.3f} ms   {plan}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--users", type=int, default=200000)
+    parser.add_argument("--courses", type=int, default=5000)
+    parser.add_argument("--enrollments", type=int, default=1000000)
+    parser.add_argument("--materials", type=int, default=100000)
+    parser.add_argument("--lookups", type=int, default=200)
+    args = parser.parse_args()
+
+    db_path = os.path.join(WORKDIR, "catalog.db")
+    start = time.perf_counter()
+    build(db_path, args.users, args.courses, args.enrollments, args.materials)
+    print(f"built {args.enrollments} enrollments / {args.materials} materials in {time.perf_counter() - start:.1f}s")
+    print(f"{'schema':<8}{'helper':<22}{'per call':>13}   query plan")
+    report("v2", db_path, args.users, args.courses, args.lookups)
+    start = time.perf_counter()
+    app.migrate_db(db_path, app.MIGRATIONS)
+    print(f"migrated to v{app.MIGRATIONS[-1][0]} in {time.perf_counter() - start:.1f}s")
+    report(f"v{app.MIGRATIONS[-1][0]}", db_path, args.users, args.courses, args.lookups)
+
+
+if __name__ == "__main__":
+    main()
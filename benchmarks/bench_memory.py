@@ -0,0 +1,55 @@
+"""Peak RSS of text extraction as page count grows: in-memory legacy path vs constant-memory mode
+
+The legacy path keeps the upload in memory, parses every page through one pdfplumber
+document without releasing page caches, and builds the text with string concatenation.
+The constant-memory path spools the upload to a temp file, releases each page after it is
+read and writes the text to a file as pages arrive. Each run is a fresh process.
+
+    python benchmarks/bench_memory.py --pages 25 100 400
+"""
+import argparse
+import io
+import os
+import sys
+import tempfile
+
+import pdfplumber
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+from bench_ocr import run_isolated  # noqa: E402
+from corpus import QUESTIONS_PER_PAGE, make_text_pdf, question_lines  # noqa: E402
+
+
+def legacy_path(pdf_bytes):
+    """extract_text_from_pdf before pages were released and text written incrementally"""
+    text = ""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            text += (page.extract_text() or "") + "\n"
+    return len(text)
+
+
+def constant_memory_path(pdf_bytes):
+    # Upload arrives as a file object, as Streamlit hands it over
+    with app.spooled_pdf(io.BytesIO(pdf_bytes)) as pdf_path, tempfile.TemporaryFile("w+") as out:
+        for page_text, _ in app.iter_page_results(pdf_path, workers=1):
+            out.write((page_text or "") + "\n")
+        return out.tell()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, nargs="+", default=[25, 100, 400])
+    args = parser.parse_args()
+
+    print(f"{'pages':>6}  {'path':<18}{'wall s':>10}{'cpu s':>10}{'RSS growth MB':>16}")
+    for pages in args.pages:
+        pdf_bytes = make_text_pdf(question_lines(pages * QUESTIONS_PER_PAGE))
+        for name, target in (("legacy", legacy_path), ("constant-memory", constant_memory_path)):
+            wall, cpu, rss = run_isolated(target, pdf_bytes)
+            print(f"{pages:>6}  {name:<18}{wall:>10.2f}{cpu:>10.2f}{rss:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
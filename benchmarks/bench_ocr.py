@@ -0,0 +1,104 @@
+"""Compare the legacy OCR path (to_image -> PNG -> Image.open) with the OCR engine
+
+Each variant runs in a fresh process so CPU time and peak RSS are measured in isolation.
+Without a Tesseract binary the OCR call itself is skipped, but the image is still written
+to Tesseract's temp file exactly as pytesseract would, so encode costs are included.
+
+    python benchmarks/bench_ocr.py --pages 20 --dpi 200
+"""
+import argparse
+import io
+import multiprocessing
+import os
+import resource
+import sys
+import time
+
+from PIL import Image
+import pdfplumber
+import pypdfium2
+import pytesseract
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+from corpus import QUESTIONS_PER_PAGE, make_scanned_pdf, question_lines  # noqa: E402
+
+
+def tesseract_available():
+    try:
+        pytesseract.get_tesseract_version()
+        return True
+    except pytesseract.TesseractNotFoundError:
+        return False
+
+
+def run_ocr(image, use_tesseract, **kwargs):
+    if use_tesseract:
+        return pytesseract.image_to_string(image, **kwargs)
+    # Same temp-file write pytesseract performs before invoking the binary
+    with pytesseract.pytesseract.save(image):
+        return ""
+
+
+def legacy_path(pdf_bytes, use_tesseract):
+    """extract_text_from_pdf's OCR branch before the OCR engine was added"""
+    with pdfplumber.open(io.BytesIO(pdf_bytes)) as pdf:
+        for page in pdf.pages:
+            image = page.to_image()
+            img_bytes = io.BytesIO()
+            image.save(img_bytes, format='PNG')
+            img_bytes.seek(0)
+            run_ocr(Image.open(img_bytes), use_tesseract)
+
+
+def engine_path(pdf_bytes, use_tesseract, dpi):
+    settings = dict(app.OCR_SETTINGS, dpi=dpi)
+    doc = pypdfium2.PdfDocument(pdf_bytes)
+    try:
+        for page_index in range(len(doc)):
+            image = app.preprocess_page_image(app.render_page_image(doc, page_index, settings), settings)
+            image.format = "PPM"
+            config = app.tesseract_config(settings["config"], dpi, bool(settings["binarize_threshold"]))
+            run_ocr(image, use_tesseract, lang=settings["lang"], config=config)
+    finally:
+        doc.close()
+
+
+def measure(target, args, queue):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_wall = time.perf_counter()
+    target(*args)
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    queue.put((time.perf_counter() - start_wall, usage.ru_utime + usage.ru_stime, (usage.ru_maxrss - rss_before) / 1024))
+
+
+def run_isolated(target, *args):
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    process = ctx.Process(target=measure, args=(target, args, queue))
+    process.start()
+    result = queue.get()
+    process.join()
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--pages", type=int, default=10)
+    parser.add_argument("--dpi", type=int, default=app.OCR_SETTINGS["dpi"])
+    args = parser.parse_args()
+
+    pdf_bytes = make_scanned_pdf(question_lines(args.pages * QUESTIONS_PER_PAGE))
+    use_tesseract = tesseract_available()
+    print(f"{args.pages} scanned pages, tesseract {'enabled' if use_tesseract else 'not found (OCR call skipped)'}")
+    print(f"{'path':<28}{'wall s':>10}{'cpu s':>10}{'RSS growth MB':>16}")
+    variants = [("legacy (72 dpi, PNG)", legacy_path, ()), ("engine (72 dpi, raw)", engine_path, (72,))]
+    if args.dpi != 72:
+        variants.append((f"engine ({args.dpi} dpi, raw)", engine_path, (args.dpi,)))
+    for name, target, extra in variants:
+        wall, cpu, rss = run_isolated(target, pdf_bytes, use_tesseract, *extra)
+        print(f"{name:<28}{wall:>10.2f}{cpu:>10.2f}{rss:>16.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""Scaling benchmark for fast_parse_pdf_content on large synthetic question banks
+
+Time per question should stay flat as the bank grows (linear total time).
+
+    python benchmarks/bench_parser.py --sizes 500 5000 50000
+"""
+import argparse
+import os
+import random
+import re
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+
+OPTION_STYLES = ("{L}) {text}", "({l}) {text}", "{l}. {text}")
+
+
+def make_question_bank(count, seed=0):
+    """Synthetic paper mixing option styles, wrapped options and side-by-side options"""
+    rng = random.Random(seed)
+    lines = ["SSC CGL Practice Set", "Time: 60 minutes"]
+    for number in range(1, count + 1):
+        lines.append(f"Q{number}. Which of the following best completes statement number {number} "
+                     f"about the {rng.choice(['passage', 'verb', 'synonym', 'reasoning'])}?")
+        style = rng.choice(OPTION_STYLES)
+        letters = "ABCDE"[:rng.choice((4, 5))]
+        if rng.random() < 0.2:
+            lines.append(" ".join(f"({l.lower()}) {rng.randint(1, 999)}" for l in letters))
+        else:
+            for letter in letters:
+                lines.append(style.format(L=letter, l=letter.lower(), text=f"option text {letter} for {number}"))
+                if rng.random() < 0.1:
+                    lines.append("which wraps onto a second line")
+        lines.append(f"Answer: {rng.choice(letters)}")
+    return "\n".join(lines) + "\n"
+
+
+def legacy_parse(text):
+    """fast_parse_pdf_content before the tokenizer, without its 20-question cap"""
+    questions = []
+    for block in re.split(r'(?i)(?:Q|Question\s*)\d+[\.\)\s:-]+', text)[1:]:
+        if not block.strip():
+            continue
+        options = {m.group(1): m.group(2).strip() for m in re.finditer(r'([A-D])\)\s*([^\n]+)', block)}
+        answer = re.search(r'(?i)Answer:\s*([A-D])', block)
+        questions.append((re.split(r'(?i)A\)|Answer:', block)[0].strip()[:300], options,
+                          answer.group(1) if answer else 'A'))
+    return questions
+
+
+def best_of(func, text, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        result = func(text)
+        timings.append(time.perf_counter() - start)
+    return min(timings), len(result)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--sizes", type=int, nargs="+", default=[500, 5000, 50000])
+    parser.add_argument("--repeat", type=int, default=3)
+    args = parser.parse_args()
+
+    print(f"{'questions':>10}{'MB':>8}{'parsed':>9}{'tokenizer s':>13}{'us/question':>13}{'legacy s':>10}")
+    for size in args.sizes:
+        text = make_question_bank(size)
+        seconds, parsed = best_of(app.fast_parse_pdf_content, text, args.repeat)
+        legacy_seconds, _ = best_of(legacy_parse, text, args.repeat)
+        print(f"{size:>10}{len(text) / 1e6:>8.1f}{parsed:>9}{seconds:>13.3f}"
+              f"{seconds / size * 1e6:>13.1f}{legacy_seconds:>10.3f}")
+
+
+if __name__ == "__main__":
+    main()
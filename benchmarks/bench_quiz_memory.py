@@ -0,0 +1,83 @@
+"""Memory per quiz session: per-question dicts vs the shared question store with typed arrays
+
+Builds --sessions concurrent sessions of the same --questions mock test, every question
+answered, timed and half of them marked, and reports traced Python memory. The legacy
+layout gives each session its own question dicts plus user_answers / marked_review /
+show_ai_explanation; the compact layout keeps one copy of each question in the store and
+only ids and arrays per session. Each layout is measured in a fresh process.
+
+    python benchmarks/bench_quiz_memory.py --questions 2000 --sessions 200
+"""
+import argparse
+import os
+import sys
+import tracemalloc
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+from bench_ocr import run_isolated  # noqa: E402
+from corpus import question_lines  # noqa: E402
+
+
+def paper_text(count):
+    return "\n".join(line for page in question_lines(count) for line in page)
+
+
+def legacy_sessions(count, sessions):
+    """quiz_data as built before the question store: each session parses its own copy"""
+    text = paper_text(count)
+    tracemalloc.start()
+    kept = []
+    for _ in range(sessions):
+        questions = app.fast_parse_pdf_content(text)
+        for question in questions:
+            question['time_spent'] = 12.5
+            question['attempts'] = 1
+        kept.append({'questions': questions,
+                     'user_answers': {idx: "B" for idx in range(len(questions))},
+                     'marked_review': set(range(0, len(questions), 2)),
+                     'show_ai_explanation': {idx: False for idx in range(len(questions))}})
+    report(tracemalloc.get_traced_memory()[0], 0, sessions)
+
+
+def compact_sessions(count, sessions):
+    questions = app.fast_parse_pdf_content(paper_text(count))
+    for question in questions:
+        question['bank_id'] = question['id']  # stands in for save_to_question_bank
+    tracemalloc.start()
+    app.store_questions(questions)
+    del questions
+    store_bytes = tracemalloc.get_traced_memory()[0]
+    kept = []
+    for _ in range(sessions):
+        quiz_data = app.new_quiz_session()
+        app.add_quiz_questions(quiz_data, range(1, count + 1))
+        for idx in range(count):
+            quiz_data['answers'][idx] = ord("B")
+            quiz_data['time_spent'][idx] = 12.5
+            quiz_data['attempts'][idx] = 1
+            quiz_data['marked'][idx] = idx % 2 == 0
+        kept.append(quiz_data)
+    report(tracemalloc.get_traced_memory()[0], store_bytes, sessions)
+
+
+def report(total_bytes, store_bytes, sessions):
+    per_session = (total_bytes - store_bytes) / sessions
+    print(f"  shared store {store_bytes / 1024 / 1024:8.2f} MB   per session {per_session / 1024:10.1f} KB", end="", flush=True)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, default=2000)
+    parser.add_argument("--sessions", type=int, default=100)
+    args = parser.parse_args()
+
+    print(f"{args.sessions} sessions x {args.questions} questions")
+    for name, target in (("legacy dicts", legacy_sessions), ("compact", compact_sessions)):
+        print(f"{name:<14}", end="", flush=True)
+        wall, cpu, rss = run_isolated(target, args.questions, args.sessions)
+        print(f"   RSS growth {rss:8.1f} MB")
+
+
+if __name__ == "__main__":
+    main()
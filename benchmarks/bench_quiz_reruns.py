@@ -0,0 +1,77 @@
+"""Script reruns per quiz: server-side quiz interface vs the browser quiz player
+
+Drives app.py headlessly with Streamlit's AppTest. The server player is clicked through
+(answer + Next per question, then Finish); the browser player renders once and then
+receives its answer sheet, exactly as the component posts it.
+
+    python benchmarks/bench_quiz_reruns.py --questions 10 50
+"""
+import argparse
+import os
+import sys
+import tempfile
+import time
+
+from streamlit.testing.v1 import AppTest
+
+WORKDIR = tempfile.mkdtemp(prefix="selectionway-bench-")
+os.environ["SELECTIONWAY_DB"] = os.path.join(WORKDIR, "reruns.db")
+APP = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "app.py")
+sys.path.insert(0, os.path.dirname(APP))
+import app  # noqa: E402
+
+
+def new_quiz(count, player):
+    app.migrate_db(app.DB_PATH, app.MIGRATIONS)
+    questions = list(app.classify_questions(
+        app.make_question(i, f"Question {i}", {"A": "one", "B": "two", "C": "three"}, "B")
+        for i in range(1, count + 1)))
+    quiz_data = app.new_quiz_session(player=player, runs_at_start=0)
+    app.add_bank_questions(quiz_data, f"reruns-{count}", questions)
+    return quiz_data
+
+
+def start(count, player):
+    at = AppTest.from_file(APP, default_timeout=60).run()
+    at.sidebar.radio[0].set_value("📝 PDF Quiz Maker").run()
+    quiz_data = new_quiz(count, player)
+    quiz_data['runs_at_start'] = at.session_state['script_runs']
+    at.session_state['quiz_data'] = quiz_data
+    at.run()
+    return at
+
+
+def button(at, predicate):
+    return next(b for b in at.button if predicate(b))
+
+
+def server_quiz(count):
+    at = start(count, 'server')
+    for idx in range(count):
+        button(at, lambda b: b.key == f"opt_{idx}_B").click().run()
+        label = "Next ▶" if idx < count - 1 else "Finish 🏁"
+        button(at, lambda b: b.label == label).click().run()
+    return at.session_state['quiz_data']['quiz_reruns']
+
+
+def client_quiz(count):
+    at = start(count, 'client')
+    key = at.get("component_instance")[0].key
+    at.session_state[key] = {"answers": {str(i): "B" for i in range(count)}, "marked": [],
+                             "time_spent": [1.0] * count, "attempts": [1] * count, "end_time": time.time()}
+    at.run()
+    return at.session_state['quiz_data']['quiz_reruns']
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, nargs="+", default=[10, 50])
+    args = parser.parse_args()
+
+    print(f"{'questions':>10}{'server reruns':>15}{'browser reruns':>16}")
+    for count in args.questions:
+        print(f"{count:>10}{server_quiz(count):>15}{client_quiz(count):>16}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,147 @@
+"""Synthetic question papers and databases for the benchmarks
+
+Everything is generated locally and deterministically from a seed, so runs on
+different machines (or before and after a change) measure the same input.
+"""
+import io
+import random
+
+from PIL import Image, ImageDraw, ImageFont
+import pypdfium2
+
+TOPICS = ("synonym", "antonym", "verb", "tense", "passage", "reasoning", "percentage", "history")
+QUESTIONS_PER_PAGE = 8
+
+
+def question_lines(count, seed=0):
+    """Lines of a question paper with `count` questions, grouped into pages"""
+    rng = random.Random(seed)
+    pages, page = [], ["SSC CGL Practice Set"]
+    for number in range(1, count + 1):
+        topic = rng.choice(TOPICS)
+        page.append(f"Q{number}. Which option best answers item {number} on {topic}?")
+        options = [f"{rng.choice(TOPICS)} choice {rng.randint(1, 99)}" for _ in range(4)]
+        page.extend(f"{letter}) {text}" for letter, text in zip("ABCD", options))
+        page.append(f"Answer: {rng.choice('ABCD')}")
+        if number % QUESTIONS_PER_PAGE == 0:
+            pages.append(page)
+            page = []
+    if page:
+        pages.append(page)
+    return pages
+
+
+def make_text_pdf(pages):
+    """PDF with a real text layer: one Helvetica text object per page, no external tools"""
+    objects = [b"<< /Type /Catalog /Pages 2 0 R >>",
+               ("<< /Type /Pages /Kids [%s] /Count %d >>"
+                % (" ".join(f"{4 + 2 * i} 0 R" for i in range(len(pages))), len(pages))).encode(),
+               b"<< /Type /Font /Subtype /Type1 /BaseFont /Helvetica >>"]
+    for i, lines in enumerate(pages):
+        objects.append((f"<< /Type /Page /Parent 2 0 R /MediaBox [0 0 595 842] "
+                        f"/Resources << /Font << /F1 3 0 R >> >> /Contents {5 + 2 * i} 0 R >>").encode())
+        escaped = (line.replace("\\", "\\\\").replace("(", "\\(").replace(")", "\\)") for line in lines)
+        content = ("BT /F1 10 Tf 14 TL 50 800 Td " + " ".join(f"({line}) Tj T*" for line in escaped) + " ET")
+        content = content.encode("latin-1")
+        objects.append(b"<< /Length %d >>\nstream\n%s\nendstream" % (len(content), content))
+
+    out = bytearray(b"%PDF-1.4\n")
+    offsets = []
+    for number, body in enumerate(objects, 1):
+        offsets.append(len(out))
+        out += b"%d 0 obj\n%s\nendobj\n" % (number, body)
+    xref = len(out)
+    out += b"xref\n0 %d\n0000000000 65535 f \n" % (len(objects) + 1)
+    out += b"".join(b"%010d 00000 n \n" % offset for offset in offsets)
+    out += b"trailer\n<< /Size %d /Root 1 0 R >>\nstartxref\n%d\n%%%%EOF\n" % (len(objects) + 1, xref)
+    return bytes(out)
+
+
+def make_scanned_pdf(pages, dpi=150):
+    """Image-only PDF of the same pages, as a scanner would produce
+    
+    Pages are encoded one at a time and merged, so only one page bitmap is in memory.
+    """
+    font = ImageFont.load_default(size=dpi // 6)
+    doc = pypdfium2.PdfDocument.new()
+    try:
+        for lines in pages:
+            image = Image.new("RGB", (int(8.27 * dpi), int(11.69 * dpi)), "white")
+            draw = ImageDraw.Draw(image)
+            y = dpi
+            for line in lines:
+                draw.text((dpi, y), line, fill="black", font=font)
+                y += dpi // 5
+            page_pdf = io.BytesIO()
+            image.save(page_pdf, "PDF", resolution=dpi)
+            page_doc = pypdfium2.PdfDocument(page_pdf.getvalue())
+            doc.import_pages(page_doc)
+            page_doc.close()
+        buf = io.BytesIO()
+        doc.save(buf)
+        return buf.getvalue()
+    finally:
+        doc.close()
+
+
+def make_mixed_pdf(pages, dpi=150):
+    """Alternating text-layer and scanned pages, like a paper with photocopied inserts"""
+    text_doc = pypdfium2.PdfDocument(make_text_pdf(pages))
+    scanned_doc = pypdfium2.PdfDocument(make_scanned_pdf(pages, dpi))
+    mixed = pypdfium2.PdfDocument.new()
+    try:
+        for index in range(len(pages)):
+            mixed.import_pages(scanned_doc if index % 2 else text_doc, [index])
+        buf = io.BytesIO()
+        mixed.save(buf)
+        return buf.getvalue()
+    finally:
+        for doc in (mixed, scanned_doc, text_doc):
+            doc.close()
+
+
+PDF_MAKERS = {"text": make_text_pdf, "scanned": make_scanned_pdf, "mixed": make_mixed_pdf}
+
+
+def make_pdf(kind, questions, seed=0):
+    """Synthetic question paper of the given kind ("text", "scanned" or "mixed")"""
+    return PDF_MAKERS[kind](question_lines(questions, seed))
+
+
+def build_db(app, db_path, users, courses, enrollments, materials, quizzes=0, seed=0):
+    """Fully migrated database filled with synthetic catalog, enrollment and quiz history rows"""
+    app.migrate_db(db_path, app.MIGRATIONS)
+    rng = random.Random(seed)
+    with app.db_write(db_path) as conn:
+        conn.executemany("INSERT OR IGNORE INTO courses VALUES (?, ?, ?, ?, ?)",
+                         ((c, f"Course {c}", "Synthetic course", 10, 0) for c in range(1, courses + 1)))
+        pairs = set()
+        while len(pairs) < min(enrollments, users * courses):
+            pairs.add((rng.randint(1, users), rng.randint(1, courses)))
+        conn.executemany("INSERT OR IGNORE INTO enrollments VALUES (?, ?, '2024-09-20', '2024-10-03', 730)", pairs)
+        conn.executemany("INSERT OR IGNORE INTO study_materials (id, course_id, name, file_type, upload_date) "
+                         "VALUES (?, ?, ?, 'PDF', '2024-09-20')",
+                         ((m, rng.randint(1, courses), f"Notes {m}.pdf") for m in range(100, materials + 100)))
+    if quizzes:
+        app.write_quiz_results(db_path, make_quiz_records(quizzes, users, courses, seed))
+
+
+def make_quiz_records(count, users, courses, seed=0, questions=20):
+    """Finished-quiz records in the shape submit_quiz_result queues for the writer"""
+    rng = random.Random(seed)
+    records = []
+    for _ in range(count):
+        answers = []
+        for idx in range(questions):
+            selected, correct = rng.choice("ABCD"), rng.choice("ABCD")
+            answers.append((idx, selected, correct, int(selected == correct), round(rng.uniform(2, 60), 2), 1))
+        records.append({
+            "user_id": rng.randint(1, users),
+            "course_id": rng.randint(1, courses),
+            "score": sum(answer[3] for answer in answers),
+            "total_questions": questions,
+            "time_taken": int(sum(answer[4] for answer in answers)),
+            "quiz_date": f"2024-{rng.randint(1, 12):02d}-{rng.randint(1, 28):02d} 10:00:00",
+            "answers": answers
+        })
+    return records
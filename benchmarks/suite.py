@@ -0,0 +1,273 @@
+"""Benchmark suite: PDF extraction, question parsing and the SQLite helpers on synthetic data
+
+Every case runs in a fresh forked process and records wall/CPU time, throughput and
+peak RSS growth. Results are compared with a stored baseline; a case slower (or
+hungrier) than the baseline by more than --tolerance is reported as a regression
+and the exit status is 1, so the suite can gate a change.
+
+    python benchmarks/suite.py                      # compare with benchmarks/baseline.json
+    python benchmarks/suite.py --save-baseline      # record a new baseline on this machine
+    python benchmarks/suite.py --questions 10 200 --enrollments 100000 --kinds text
+"""
+import argparse
+import gc
+import itertools
+import json
+import multiprocessing
+import os
+import platform
+import random
+import resource
+import sys
+import tempfile
+import time
+
+WORKDIR = tempfile.mkdtemp(prefix="selectionway-bench-")
+os.environ["SELECTIONWAY_DB"] = os.path.join(WORKDIR, "suite.db")
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+import app  # noqa: E402
+import corpus  # noqa: E402
+from bench_ocr import tesseract_available  # noqa: E402
+
+BASELINE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "baseline.json")
+LOOKUPS = 500
+QUIZ_WRITES = 2000
+OCR_KINDS = {"scanned", "mixed"}  # corpus kinds with pages that need OCR
+
+
+class CaseFailed(Exception):
+    """A stage hit errors, so its timing would describe the error path rather than the work"""
+
+
+def measure(target, args, queue):
+    rss_before = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    start_wall = time.perf_counter()
+    try:
+        units = target(*args)
+    except Exception as e:
+        queue.put({"error": f"{type(e).__name__}: {e}"})
+        return
+    wall = time.perf_counter() - start_wall
+    usage = resource.getrusage(resource.RUSAGE_SELF)
+    children = resource.getrusage(resource.RUSAGE_CHILDREN)
+    queue.put({
+        "wall_s": round(wall, 4),
+        "cpu_s": round(usage.ru_utime + usage.ru_stime + children.ru_utime + children.ru_stime, 4),
+        "units": units,
+        "throughput": round(units / wall, 2) if wall else None,
+        # Forked pool workers start at this process's RSS, so their peak is also counted as growth
+        "peak_rss_mb": round(max(usage.ru_maxrss, children.ru_maxrss) / 1024 - rss_before / 1024, 1),
+    })
+
+
+def run_isolated(target, *args):
+    ctx = multiprocessing.get_context("fork")
+    queue = ctx.Queue()
+    process = ctx.Process(target=measure, args=(target, args, queue))
+    # Keep the parent's objects out of the child's collections for the fork: otherwise its first
+    # full collection touches every inherited page and the copy-on-write faults are timed as the case
+    gc.freeze()
+    try:
+        process.start()
+    finally:
+        gc.unfreeze()
+    result = queue.get()
+    process.join()
+    return result
+
+
+# ---- stages: each returns the number of units it processed ----
+
+def extract_stage(pdf_bytes, workers):
+    pages, errors = app.extract_pages_from_pdf(pdf_bytes, workers)
+    if errors:
+        page_no, error = errors[0]
+        raise CaseFailed(f"{len(errors)} of {len(pages)} pages failed, first on page {page_no}: {error}")
+    return len(pages)
+
+
+def parse_stage(text):
+    return len(app.fast_parse_pdf_content(text))
+
+
+def build_stage(users, courses, enrollments, materials, quizzes):
+    corpus.build_db(app, app.DB_PATH, users, courses, enrollments, materials, quizzes)
+    return enrollments
+
+
+def catalog_stage(users, courses):
+    rng = random.Random(1)
+    get_page = app.get_catalog_page.__wrapped__  # bypass the query cache: time SQLite, not dict lookups
+    for _ in range(LOOKUPS):
+        get_page(rng.randint(1, users), after_id=rng.randint(0, courses))
+    return LOOKUPS
+
+
+def user_courses_stage(users):
+    rng = random.Random(2)
+    for _ in range(LOOKUPS):
+        app.get_user_courses.__wrapped__(rng.randint(1, users))
+    return LOOKUPS
+
+
+def materials_stage(courses):
+    rng = random.Random(3)
+    for _ in range(LOOKUPS):
+        app.get_study_materials_page.__wrapped__(rng.randint(1, courses))
+    return LOOKUPS
+
+
+def quiz_write_stage(users, courses):
+    records = corpus.make_quiz_records(QUIZ_WRITES, users, courses, seed=4)
+    for start in range(0, len(records), app.QUIZ_WRITE_BATCH):
+        app.write_quiz_results(app.DB_PATH, records[start:start + app.QUIZ_WRITE_BATCH])
+    return len(records)
+
+
+def progress_stage(users):
+    rng = random.Random(5)
+    for _ in range(LOOKUPS):
+        user_id = rng.randint(1, users)
+        app.get_progress_summary.__wrapped__(user_id)
+        app.get_course_progress.__wrapped__(user_id)
+    return LOOKUPS
+
+
+def rollup_stage():
+    with app.db_write() as conn:
+        app.rebuild_progress_rollups(conn.cursor())
+        return conn.execute("SELECT COUNT(*) FROM quiz_results").fetchone()[0]
+
+
+def reset_db():
+    """Close this process's pooled connections and delete the database so the next build starts empty"""
+    idle = app.get_connection_pool(app.DB_PATH, os.getpid())["idle"]
+    while not idle.empty():
+        idle.get_nowait().close()
+    for suffix in ("", "-wal", "-shm"):
+        if os.path.exists(app.DB_PATH + suffix):
+            os.remove(app.DB_PATH + suffix)
+
+
+def pdf_cases(args):
+    kinds = args.kinds
+    if not tesseract_available() and set(kinds) & OCR_KINDS:
+        # Without Tesseract every scanned page fails; timing that would only measure the error path
+        kinds = [kind for kind in kinds if kind not in OCR_KINDS]
+        print(f"Tesseract not found: skipping {', '.join(sorted(OCR_KINDS & set(args.kinds)))} extraction cases")
+    for questions in args.questions:
+        for kind in kinds:
+            pdf_bytes = corpus.make_pdf(kind, questions)
+            yield f"extract/{kind}/{questions}q", "pages", extract_stage, (pdf_bytes, args.workers)
+        text = "\n".join(line for page in corpus.question_lines(questions) for line in page)
+        yield f"parse/{questions}q", "questions", parse_stage, (text,)
+
+
+def db_cases(args):
+    for enrollments in args.enrollments:
+        users, courses = max(enrollments // 5, 10), max(enrollments // 200, 10)
+        quizzes, materials = enrollments // 20, enrollments // 10
+        suffix = f"{enrollments}e"
+        yield None, None, reset_db, ()
+        yield f"db/build/{suffix}", "enrollments", build_stage, (users, courses, enrollments, materials, quizzes)
+        yield f"db/catalog_page/{suffix}", "queries", catalog_stage, (users, courses)
+        yield f"db/user_courses/{suffix}", "queries", user_courses_stage, (users,)
+        yield f"db/materials_page/{suffix}", "queries", materials_stage, (courses,)
+        yield f"db/progress/{suffix}", "users", progress_stage, (users,)
+        yield f"db/quiz_writes/{suffix}", "quizzes", quiz_write_stage, (users, courses)
+        yield f"db/rebuild_rollups/{suffix}", "quizzes", rollup_stage, ()
+
+
+def compare(results, baseline, tolerance, min_delta):
+    """Print each case next to its baseline; returns the names of regressed cases"""
+    regressions = []
+    print(f"\n{'case':<32}{'wall s':>10}{'base s':>10}{'ratio':>8}{'RSS MB':>9}{'base MB':>9}  status")
+    for name, result in results.items():
+        base = baseline.get(name)
+        if not base:
+            print(f"{name:<32}{result['wall_s']:>10.3f}{'-':>10}{'-':>8}{result['peak_rss_mb']:>9.1f}{'-':>9}  new")
+            continue
+        ratio = result["wall_s"] / base["wall_s"] if base["wall_s"] else 1.0
+        # Sub-second cases jitter by tens of milliseconds; ignore changes smaller than min_delta
+        significant = abs(result["wall_s"] - base["wall_s"]) > min_delta
+        # Small absolute memory changes are noise; only flag growth past 16 MB as well as the ratio
+        memory_up = result["peak_rss_mb"] > base["peak_rss_mb"] * (1 + tolerance) + 16
+        status = "ok"
+        if (significant and ratio > 1 + tolerance) or memory_up:
+            status = "REGRESSION"
+            regressions.append(name)
+        elif significant and ratio < 1 - tolerance:
+            status = "faster"
+        print(f"{name:<32}{result['wall_s']:>10.3f}{base['wall_s']:>10.3f}{ratio:>8.2f}"
+              f"{result['peak_rss_mb']:>9.1f}{base['peak_rss_mb']:>9.1f}  {status}")
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("--questions", type=int, nargs="+", default=[10, 200, 2000])
+    parser.add_argument("--kinds", nargs="+", choices=sorted(corpus.PDF_MAKERS), default=["text", "scanned", "mixed"])
+    parser.add_argument("--enrollments", type=int, nargs="+", default=[10000, 1000000])
+    parser.add_argument("--workers", type=int, default=app.PDF_WORKERS)
+    parser.add_argument("--skip", nargs="+", choices=["pdf", "db"], default=[])
+    parser.add_argument("--baseline", default=BASELINE)
+    parser.add_argument("--save-baseline", action="store_true", help="write this run as the new baseline")
+    parser.add_argument("--output", help="also write this run's results to a JSON file")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging, 0.25 = 25%%")
+    parser.add_argument("--min-delta", type=float, default=0.1, help="ignore wall-time changes below this many seconds")
+    args = parser.parse_args()
+
+    # Generators: each synthetic PDF is built just before its case runs and dropped after
+    cases = itertools.chain(pdf_cases(args) if "pdf" not in args.skip else (),
+                            db_cases(args) if "db" not in args.skip else ())
+
+    results, failures = {}, []
+    print(f"{'case':<32}{'wall s':>10}{'cpu s':>10}{'throughput':>16}{'RSS MB':>9}")
+    for name, unit, stage, stage_args in cases:
+        if name is None:
+            stage(*stage_args)
+            continue
+        result = run_isolated(stage, *stage_args)
+        if "error" in result:
+            failures.append(name)
+            print(f"{name:<32}FAILED  {result['error']}")
+            continue
+        result["unit"] = unit
+        results[name] = result
+        print(f"{name:<32}{result['wall_s']:>10.3f}{result['cpu_s']:>10.3f}"
+              f"{result['throughput']:>10.1f} {unit:<5}{result['peak_rss_mb']:>9.1f}")
+
+    if failures:
+        # A baseline or comparison with failed cases would gate on error paths
+        print(f"\n{len(failures)} case(s) failed: {', '.join(failures)}")
+        sys.exit(1)
+
+    run = {
+        "recorded_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        "machine": {"python": platform.python_version(), "platform": platform.platform(),
+                    "cpus": os.cpu_count(), "pdf_workers": args.workers},
+        "cases": results,
+    }
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump(run, f, indent=2)
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(run, f, indent=2)
+        print(f"\nBaseline saved to {args.baseline}")
+        return
+
+    if not os.path.exists(args.baseline):
+        print(f"\nNo baseline at {args.baseline}; run with --save-baseline first")
+        return
+    with open(args.baseline) as f:
+        baseline = json.load(f)
+    print(f"Baseline recorded {baseline['recorded_at']} on {baseline['machine']['platform']}")
+    regressions = compare(results, baseline["cases"], args.tolerance, args.min_delta)
+    if regressions:
+        print(f"\n{len(regressions)} regression(s): {', '.join(regressions)}")
+        sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()